@@ -0,0 +1,176 @@
+"""
+Batch Mode - OpenAI Batch API execution for recombine.py
+
+Instead of one synchronous chat completion per pair, every pair is serialized into
+Batch API JSONL files, which are uploaded and processed asynchronously by OpenAI at a
+lower price. Large matrices are split across several batch files. The functions only
+use `client.files` and `client.batches`, so any OpenAI-compatible client (including one
+pointed at a local stand-in server through OPENAI_BASE_URL) can be passed in.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+
+# Batch API input file limits, with some headroom on the size
+MAX_REQUESTS_PER_FILE = 50000
+MAX_BYTES_PER_FILE = 190 * 1024 * 1024
+
+POLL_INTERVAL_SECONDS = 30
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def custom_id(index):
+    """Return the batch custom_id for the pair at position `index`."""
+    return f"pair-{index}"
+
+
+def write_batch_files(requests, directory, settings, max_requests=MAX_REQUESTS_PER_FILE, max_bytes=MAX_BYTES_PER_FILE):
+    """Write (custom_id, messages) requests into as many batch files as needed.
+
+    `settings` holds the model, temperature and max_tokens sent with every request. A
+    request may also be (custom_id, messages, fields), with extra body fields for it
+    alone (e.g. its prompt_cache_key). Returns the list of file paths written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    f = None
+    count = 0
+    size = 0
+    try:
+        for request_id, messages, *fields in requests:
+            body = dict(settings, messages=messages)
+            if fields:
+                body.update(fields[0])
+            line = json.dumps({
+                "custom_id": request_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": body
+            }) + "\n"
+            line_bytes = len(line.encode("utf-8"))
+            if f is None or count >= max_requests or size + line_bytes > max_bytes:
+                if f is not None:
+                    f.close()
+                path = os.path.join(directory, f"batch-{len(paths) + 1:04d}.jsonl")
+                paths.append(path)
+                f = open(path, "w", encoding="utf-8")
+                count = 0
+                size = 0
+            f.write(line)
+            count += 1
+            size += line_bytes
+    finally:
+        if f is not None:
+            f.close()
+    return paths
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def submit_batches(client, paths, state_path):
+    """Upload each batch file and create its batch, returning the batch IDs.
+
+    Submitted batches are recorded in `state_path` with a hash of their file, so running
+    again after an interruption picks up the existing batches instead of paying twice.
+    A recorded batch that failed, expired or was cancelled is submitted again.
+    """
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+
+    batch_ids = []
+    for path in paths:
+        name = os.path.basename(path)
+        digest = _file_digest(path)
+        previous = state.get(name)
+        if previous and previous["sha256"] == digest:
+            status = client.batches.retrieve(previous["batch_id"]).status
+            if status not in TERMINAL_STATUSES or status == "completed":
+                print(f"Reusing batch {previous['batch_id']} for {name}")
+                batch_ids.append(previous["batch_id"])
+                continue
+            print(f"Batch {previous['batch_id']} for {name} is {status}; submitting it again")
+
+        with open(path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW
+        )
+        print(f"Submitted batch {batch.id} for {name}")
+        batch_ids.append(batch.id)
+
+        state[name] = {"sha256": digest, "batch_id": batch.id}
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+    return batch_ids
+
+
+def wait_for_batches(client, batch_ids, poll_interval=POLL_INTERVAL_SECONDS, on_progress=None):
+    """Poll until every batch reaches a terminal status and return the final batch objects.
+
+    `on_progress` is called with the total number of finished requests across batches.
+    """
+    batches = {}
+    while True:
+        done = 0
+        for batch_id in batch_ids:
+            if batch_id in batches and batches[batch_id].status in TERMINAL_STATUSES:
+                batch = batches[batch_id]
+            else:
+                batch = client.batches.retrieve(batch_id)
+                batches[batch_id] = batch
+            if batch.request_counts is not None:
+                done += batch.request_counts.completed + batch.request_counts.failed
+        if on_progress:
+            on_progress(done)
+        if all(batch.status in TERMINAL_STATUSES for batch in batches.values()):
+            return [batches[batch_id] for batch_id in batch_ids]
+        time.sleep(poll_interval)
+
+
+def _iter_records(client, file_id):
+    """Yield the records of a batch result file one line at a time, without loading it whole."""
+    if not file_id:
+        return
+    with client.files.with_streaming_response.content(file_id) as response:
+        for line in response.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_batch_results(client, batches):
+    """Yield (custom_id, body, error, error_type) for every request in the finished batches, as read.
+
+    `body` is the chat completion response body of a successful request, and `error`
+    the message of a failed one (with `body` None) and `error_type` its class, e.g.
+    "rate_limit_exceeded" or "http_500". Results are streamed batch by batch, each
+    batch's few errors before its outputs, so they arrive close to request order.
+    """
+    for batch in batches:
+        for file_id in (batch.error_file_id, batch.output_file_id):
+            for record in _iter_records(client, file_id):
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                status = response.get("status_code")
+                if record.get("error"):
+                    error = record["error"]
+                    yield record["custom_id"], None, error.get("message", str(error)), error.get("code") or "batch_error"
+                elif status != 200:
+                    error = body.get("error") or {}
+                    yield record["custom_id"], None, error.get("message", f"HTTP {status}"), error.get("code") or error.get("type") or f"http_{status}"
+                else:
+                    yield record["custom_id"], body, None, None
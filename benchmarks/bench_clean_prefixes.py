@@ -0,0 +1,73 @@
+"""
+Benchmark - prefix cleaning
+
+Compares the original per-cell `clean_text()` (one `apply` call per row, lowercasing
+the text again for every prefix) with the precompiled regex applied to the whole
+column by clean_prefixes.clean_series, on synthetic generated prompts.
+
+Usage:
+    python benchmarks/bench_clean_prefixes.py [--rows 1000000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from clean_prefixes import clean_series
+
+PREFIXES = ["Problem Statement:", "Opportunity:", "Solution:", "Insight:", "Problem:", "Observation:"]
+
+
+def legacy_clean_text(text):
+    """The original clean_text()."""
+    if not isinstance(text, str):
+        return text
+
+    text_lower = text.lstrip()
+
+    for prefix in PREFIXES:
+        if text_lower.lower().startswith(prefix.lower()):
+            return text[len(prefix):].lstrip()
+
+    return text
+
+
+def make_prompts(rows, seed=0):
+    """Synthetic generated prompts: most with a prefix in some casing, a few missing values."""
+    rng = np.random.default_rng(seed)
+    heads = PREFIXES + [prefix.upper() for prefix in PREFIXES] + [prefix.lower() for prefix in PREFIXES] + [""] * 6
+    body = "Teams lose track of which experiments were already run and repeat them across quarters."
+    prompts = [f"{heads[i]} {body}" if heads[i] else body for i in rng.integers(0, len(heads), size=rows)]
+    series = pd.Series(prompts)
+    series[rng.random(rows) < 0.01] = None
+    return series
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'apply (s)':>11} {'vectorized (s)':>16} {'speedup':>9}")
+    for rows in args.rows:
+        prompts = make_prompts(rows)
+        legacy_time, legacy = timed(prompts.apply, legacy_clean_text)
+        vectorized_time, cleaned = timed(clean_series, prompts)
+        # No prompt starts with whitespace here, so both versions must agree
+        assert legacy.astype(object).equals(cleaned.astype(object))
+        print(f"{rows:>10} {legacy_time:>11.3f} {vectorized_time:>16.3f} {legacy_time / vectorized_time:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmark - end-to-end generation against a local mock API
+
+Starts benchmarks/mock_openai_server.py, points the OpenAI client at it through
+OPENAI_BASE_URL and generates every pair of N synthetic prompts with generation.run(),
+the same call recombine.py makes (checkpoint journal, background writer, output sink
+and run report), without the response cache or a progress window. Each case runs in
+a fresh interpreter, so its memory high-water mark is its own. For every N and
+execution mode the results record pairs per second, the peak RSS, the rows and bytes
+written, and from the run metrics the time spent writing the output file, the request
+counts, latencies and token counts.
+
+To see how much of the prompts the API could serve from its prompt cache, pass the
+server's --prompt-cache simulation and prompts long enough for the shared prefix to be
+cached (e.g. --prompt-chars 2000 --context-chars 3000); compare --order row and column.
+
+Results are printed as a table and written as JSON, so runs can be compared over
+time. N = 1000 means 499,500 pairs and takes a while; pass e.g. --sizes 10 100 for
+a quick run.
+
+Usage:
+    python benchmarks/bench_generation.py [--sizes 10 100 1000] [--modes concurrent batch]
+        [--concurrency 8 64] [--formats xlsx jsonl] [--latency-ms 50] [--rate-limit-rate 0.01]
+        [--context-chars 4000 --prompt-cache] [--order row] [--prefix-cache] [--output bench-generation.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from mock_openai_server import MockOpenAIServer, add_settings_arguments, settings_from_args
+from pairs import PAIR_ORDERS
+
+WORDS = ("teams customers data pricing onboarding churn experiments forecasts suppliers "
+         "latency support hiring compliance roadmap feedback inventory").split()
+
+
+def make_prompts(n, chars, seed=0):
+    """Synthetic input prompts of about `chars` characters each."""
+    rng = random.Random(seed)
+    prompts = []
+    for _ in range(n):
+        words = []
+        while sum(len(word) + 1 for word in words) < chars:
+            words.append(rng.choice(WORDS))
+        prompts.append(" ".join(words).capitalize() + ".")
+    return prompts
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(n, mode, concurrency, output_format, prompt_chars, context_chars, order, prefix_cache, work_dir):
+    """Generate all pairs of n prompts in this process and return the measurements.
+
+    OPENAI_BASE_URL must already point at the mock server.
+    """
+    import generation
+    from pairs import select_all
+
+    selected = select_all(make_prompts(n, prompt_chars))
+    context = " ".join(make_prompts(1, context_chars, seed=1)) if context_chars else None
+    output_file = os.path.join(work_dir, f"bench-{n}-{mode}.{output_format}")
+
+    start = time.perf_counter()
+    rows = generation.run(
+        selected,
+        output_file,
+        user_context=context,
+        mode=mode,
+        concurrency=concurrency,
+        order=order,
+        use_cache=False,
+        gui=False,
+        prefix_cache=prefix_cache
+    )
+    seconds = time.perf_counter() - start
+
+    snapshot = generation.metrics.snapshot()
+    pairs = n * (n - 1) // 2
+    return {
+        "n": n,
+        "pairs": pairs,
+        "mode": mode,
+        "concurrency": concurrency if mode == "concurrent" else None,
+        "format": output_format,
+        "order": order,
+        "prefix_cache": prefix_cache,
+        "seconds": round(seconds, 3),
+        "pairs_per_second": round(pairs / seconds, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "rows": rows,
+        "write_seconds": snapshot["write_seconds"],
+        "output_bytes": os.path.getsize(output_file),
+        "pairs_by_source": snapshot["pairs"],
+        "requests": snapshot["requests"],
+        "errors": snapshot["errors"],
+        "tokens": snapshot["tokens"],
+        "prompt_cache_hit_rate": snapshot["prompt_cache_hit_rate"],
+        "latency_seconds": snapshot["latency_seconds"],
+        "queue_wait_seconds": snapshot["queue_wait_seconds"]
+    }
+
+
+def run_case_subprocess(base_url, n, mode, concurrency, output_format, prompt_chars, context_chars, order, prefix_cache):
+    """Run one case in a fresh interpreter and return its measurements."""
+    environment = dict(os.environ, OPENAI_API_KEY="mock", OPENAI_BASE_URL=base_url)
+    command = [
+        sys.executable, os.path.abspath(__file__), "--case",
+        str(n), mode, str(concurrency), output_format, str(prompt_chars), str(context_chars), order, str(int(prefix_cache))
+    ]
+    completed = subprocess.run(command, env=environment, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Case N={n} {mode} failed:\n{completed.stderr}")
+    # The case prints its measurements as the last line; anything before it is generation's own output
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="numbers of input prompts (default: 10 100 1000)")
+    parser.add_argument("--modes", nargs="+", choices=["concurrent", "batch"], default=["concurrent", "batch"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8], help="worker counts for concurrent mode (default: 8)")
+    parser.add_argument("--formats", nargs="+", choices=["xlsx", "csv", "jsonl", "parquet"], default=["xlsx"])
+    parser.add_argument("--prompt-chars", type=int, default=400, help="length of each synthetic prompt (default: 400)")
+    parser.add_argument("--context-chars", type=int, default=0, help="length of a synthetic context sent with every pair (default: none)")
+    parser.add_argument("--order", choices=PAIR_ORDERS, default="row", help="pair order (default: row)")
+    parser.add_argument("--prefix-cache", action="store_true", help="send a prompt_cache_key per first prompt, as recombine.py --prefix-cache")
+    parser.add_argument("--output", default="bench-generation.json", help="JSON file for the results (default: bench-generation.json)")
+    parser.add_argument("--case", nargs=8, help=argparse.SUPPRESS)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    if args.case:
+        # Child process: one case, measurements on stdout
+        n, mode, concurrency, output_format, prompt_chars, context_chars, order, prefix_cache = args.case
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = run_case(int(n), mode, int(concurrency), output_format, int(prompt_chars), int(context_chars), order, prefix_cache == "1", work_dir)
+        print(json.dumps(result))
+        return
+
+    cases = [
+        (n, mode, concurrency, output_format)
+        for n in args.sizes
+        for mode in args.modes
+        for concurrency in (args.concurrency if mode == "concurrent" else [0])
+        for output_format in args.formats
+    ]
+    results = []
+    print(f"{'N':>6} {'pairs':>8} {'mode':>14} {'format':>7} {'seconds':>9} {'pairs/s':>9} {'peak MB':>8} {'write (s)':>10} {'cached':>7}")
+    with MockOpenAIServer(settings_from_args(args)) as server:
+        for n, mode, concurrency, output_format in cases:
+            result = run_case_subprocess(
+                server.base_url, n, mode, concurrency, output_format,
+                args.prompt_chars, args.context_chars, args.order, args.prefix_cache
+            )
+            results.append(result)
+            label = f"{mode}-{concurrency}" if mode == "concurrent" else mode
+            print(
+                f"{n:>6} {result['pairs']:>8} {label:>14} {output_format:>7} {result['seconds']:>9.2f} "
+                f"{result['pairs_per_second']:>9.1f} {result['peak_rss_mb'] or 0:>8.1f} {result['write_seconds']:>10.2f} "
+                f"{result['prompt_cache_hit_rate'] or 0:>7.1%}"
+            )
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "server": {
+            "latency_ms": args.latency_ms,
+            "latency_sigma": args.latency_sigma,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "retry_after": args.retry_after,
+            "completion_tokens": args.completion_tokens,
+            "cached_fraction": args.cached_fraction,
+            "prompt_cache": args.prompt_cache
+        },
+        "prompt_chars": args.prompt_chars,
+        "context_chars": args.context_chars,
+        "order": args.order,
+        "prefix_cache": args.prefix_cache,
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark - heat map rating loading and matrix construction
+
+Compares the original row-by-row `iterrows()` fill of the heat map matrix with what
+heat-map-recombined.py runs now: rating_matrix.load_ratings streaming the rated file
+into a SparseRatingMatrix, and the dense (or block-averaged) matrix that
+heatmap_render draws from it. Both sides start from the same synthetic rated file.
+Every run checks the sparse store against the legacy matrix with repeated pairs
+averaged, which is what the sparse store does instead of keeping the last rating.
+
+Usage:
+    python benchmarks/bench_heatmap.py [--sizes 10000 100000 1000000] [--prompts 2000] [--format csv]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from heatmap_render import choose_block_size
+from rating_matrix import load_ratings
+
+
+def make_ratings(rows, prompts, seed=0):
+    """Synthetic rated output: random i<j source pairs (with repeats) and ratings 1-5."""
+    rng = np.random.default_rng(seed)
+    x = rng.integers(1, prompts, size=rows)
+    y = rng.integers(x + 1, prompts + 1)
+    return pd.DataFrame({
+        "#": np.arange(1, rows + 1),
+        "Source IDs": [f"{a},{b}" for a, b in zip(x, y)],
+        "Prompt": "generated text",
+        "Rating": rng.integers(1, 6, size=rows).astype(float)
+    })
+
+
+def write_ratings(df, path):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    elif path.endswith(".xlsx"):
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def read_ratings(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".xlsx"):
+        return pd.read_excel(path)
+    return pd.read_csv(path)
+
+
+def legacy_matrix(path):
+    """The original create_heatmap(): read the whole file, then fill the matrix row by row."""
+    df = read_ratings(path)
+    source_ids = df["Source IDs"].str.split(",", expand=True).astype(int)
+    avg_ratings = df[[column for column in df.columns if "Rating" in column]].mean(axis=1)
+    max_x, max_y = source_ids[0].max(), source_ids[1].max()
+    heatmap_matrix = np.full((max_x, max_y), np.nan)
+    for idx, row in source_ids.iterrows():
+        x, y = row[0] - 1, row[1] - 1
+        heatmap_matrix[x, y] = avg_ratings[idx]
+    return heatmap_matrix
+
+
+def reference_matrix(df):
+    """The legacy matrix, but with repeated pairs averaged instead of the last one kept."""
+    source_ids = df["Source IDs"].str.split(",", expand=True).astype(int)
+    avg_ratings = df[[column for column in df.columns if "Rating" in column]].mean(axis=1)
+    cells = avg_ratings.groupby([source_ids[0], source_ids[1]]).mean()
+    x = cells.index.get_level_values(0).to_numpy()
+    y = cells.index.get_level_values(1).to_numpy()
+    matrix = np.full((source_ids[0].max(), source_ids[1].max()), np.nan)
+    matrix[x - 1, y - 1] = cells.to_numpy()
+    return matrix
+
+
+def current_matrix(path):
+    """What heat-map-recombined.py runs: stream into the sparse store, then build the drawn matrix.
+
+    Returns the sparse store and the matrix.
+    """
+    ratings = load_ratings(path)
+    rows, cols = (1, ratings.shape[0]), (1, ratings.shape[1])
+    block = choose_block_size(rows, cols)
+    if block > 1:
+        return ratings, ratings.to_blocks(block, rows, cols)
+    return ratings, ratings.to_dense(rows, cols)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--prompts", type=int, default=2000, help="number of distinct source IDs")
+    parser.add_argument("--format", choices=["csv", "parquet", "xlsx"], default="csv", help="rated file format (default: csv)")
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=1_000_000,
+        help="skip the (slow) iterrows version above this many rows"
+    )
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'iterrows (s)':>14} {'current (s)':>13} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for rows in args.sizes:
+            path = os.path.join(work_dir, f"rated-{rows}.{args.format}")
+            df = make_ratings(rows, args.prompts)
+            write_ratings(df, path)
+
+            current_time, (ratings, _) = timed(current_matrix, path)
+            assert np.allclose(ratings.to_dense(), reference_matrix(df), equal_nan=True)
+
+            if rows <= args.legacy_limit:
+                legacy_time, _ = timed(legacy_matrix, path)
+                print(f"{rows:>10} {legacy_time:>14.3f} {current_time:>13.4f} {legacy_time / current_time:>8.0f}x")
+            else:
+                print(f"{rows:>10} {'skipped':>14} {current_time:>13.4f} {'':>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Import time check - fails when starting recombine.py gets slower
+
+Runs `recombine.py SUBCOMMAND --help` under `python -X importtime` for every subcommand.
+That imports what the subcommand needs at startup and then exits. Two checks are made:
+- modules that must not be imported at startup (e.g. the OpenAI client for clean), which
+  catches a heavy import moved back to the top of a module whatever the machine
+- the total import time, best of several runs, against a budget per subcommand
+
+Budgets are milliseconds on an ordinary developer machine; pass --budget-scale on
+slower ones. Exits with status 1 if any check fails, so it can gate CI or a release.
+
+Usage:
+    python benchmarks/check_import_time.py [--repeat 5] [--budget-scale 2] [--show 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+RECOMBINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "recombine.py")
+
+# Subcommand: (import time budget in ms, modules it must not import at startup)
+CHECKS = {
+    "": (100, ["generation", "openai", "pandas", "numpy", "tkinter", "tqdm", "matplotlib"]),
+    "generate": (400, ["openai", "pandas", "numpy", "tkinter", "tqdm", "matplotlib"]),
+    "clean": (1500, ["openai", "generation", "tkinter", "matplotlib", "seaborn"]),
+    "heatmap": (600, ["openai", "generation", "pandas", "tkinter", "matplotlib", "seaborn"]),
+    "merge": (1500, ["openai", "generation", "tkinter", "matplotlib", "seaborn"]),
+}
+
+
+def import_times(subcommand):
+    """Return {module: (self µs, cumulative µs, depth)} for one start of the subcommand."""
+    command = [sys.executable, "-X", "importtime", RECOMBINE] + ([subcommand] if subcommand else []) + ["--help"]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"'{' '.join(command)}' failed:\n{completed.stderr}")
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not own.strip().isdigit():
+            continue  # the header line
+        # Every level of nesting indents the name by two more spaces
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(own), int(cumulative), depth)
+    return modules
+
+
+def total_ms(modules):
+    return sum(cumulative for _, cumulative, depth in modules.values() if depth == 0) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="starts per subcommand; the fastest counts (default: 5)")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every budget, for slower machines (default: 1)")
+    parser.add_argument("--show", type=int, default=5, help="list this many slowest top-level imports per subcommand (default: 5)")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'subcommand':<12} {'import (ms)':>12} {'budget (ms)':>12}")
+    for subcommand, (budget, forbidden) in CHECKS.items():
+        runs = [import_times(subcommand) for _ in range(args.repeat)]
+        fastest = min(runs, key=total_ms)
+        elapsed = total_ms(fastest)
+        budget *= args.budget_scale
+        label = subcommand or "(none)"
+        print(f"{label:<12} {elapsed:>12.1f} {budget:>12.0f}")
+
+        slowest = sorted(
+            ((cumulative, name) for name, (_, cumulative, depth) in fastest.items() if depth == 0),
+            reverse=True
+        )[:args.show]
+        for cumulative, name in slowest:
+            print(f"{'':<14}{cumulative / 1000:>8.1f}  {name}")
+
+        if elapsed > budget:
+            failures.append(f"{label}: imports took {elapsed:.0f} ms, over the budget of {budget:.0f} ms")
+        for module in forbidden:
+            if module in fastest:
+                failures.append(f"{label}: imports {module} at startup")
+
+    if failures:
+        print("\nImport time check failed:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nImport time check passed.")
+
+if __name__ == "__main__":
+    main()
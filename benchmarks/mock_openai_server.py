@@ -0,0 +1,329 @@
+"""
+Mock OpenAI server - a local OpenAI-compatible stub for benchmarks and tests
+
+Serves just enough of the API for recombine.py: chat completions, file uploads and
+downloads, and batches. Responses take a configurable, log-normally distributed time,
+a share of requests can be answered with 429s or 500s, and every completion reports
+token usage (including cached prompt tokens) and x-ratelimit-* headers. Cached tokens
+are either a fixed share of the prompt or, with --prompt-cache, simulated like the
+API's prompt cache. Batches are
+processed as soon as they are created. Nothing leaves the machine.
+
+Point an OpenAI client at it with OPENAI_BASE_URL=<server.base_url>.
+
+Usage:
+    python benchmarks/mock_openai_server.py [--port 8000] [--latency-ms 300] [--rate-limit-rate 0.05]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Completion text returned for every request, repeated to the configured length
+COMPLETION_WORDS = "a combined problem statement that merges both input prompts into one new idea".split()
+
+# Simulated prompt cache: prefixes of at least this many tokens are cached, in blocks,
+# from the most recent requests
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK_TOKENS = 128
+PROMPT_CACHE_ENTRIES = 16
+
+
+class MockSettings:
+    """How the mock server behaves; see the command line options for the meaning of each."""
+
+    def __init__(self, latency_ms=50.0, latency_sigma=0.5, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=0.5, completion_tokens=120, cached_fraction=0.0, prompt_cache=False,
+                 requests_per_minute=1_000_000, tokens_per_minute=1_000_000_000, seed=0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.completion_tokens = completion_tokens
+        self.cached_fraction = cached_fraction
+        self.prompt_cache = prompt_cache
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """Return (latency seconds, outcome) for one request; outcome is "ok", "429" or "500"."""
+        with self.lock:
+            latency = 0.0
+            if self.latency_ms > 0:
+                # Log-normal with the configured median, so there is a long tail
+                latency = self.latency_ms / 1000 * math.exp(self.random.gauss(0, self.latency_sigma))
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 0.0, "429"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return latency, "500"
+        return latency, "ok"
+
+
+def prompt_text(request):
+    return "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+
+
+def completion_body(settings, request, cached_tokens=None):
+    """Build a chat.completion response for a request body, with usage.
+
+    Without `cached_tokens`, the configured share of the prompt is reported as cached.
+    """
+    prompt_tokens = max(1, len(prompt_text(request)) // 4)
+    if cached_tokens is None:
+        cached_tokens = int(prompt_tokens * settings.cached_fraction)
+    words = (COMPLETION_WORDS * (settings.completion_tokens // len(COMPLETION_WORDS) + 1))[:settings.completion_tokens]
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": " ".join(words)}
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": settings.completion_tokens,
+            "total_tokens": prompt_tokens + settings.completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}
+        }
+    }
+
+
+def _multipart_file(body, content_type):
+    """Return the contents of the "file" part of a multipart/form-data body."""
+    boundary = re.search(r"boundary=\"?([^\";]+)\"?", content_type).group(1).encode()
+    for part in body.split(b"--" + boundary):
+        headers, _, content = part.partition(b"\r\n\r\n")
+        if b'name="file"' in headers:
+            return content[:-2] if content.endswith(b"\r\n") else content
+    return b""
+
+
+class MockState:
+    """Uploaded files and batches, kept in memory."""
+
+    def __init__(self):
+        self.files = {}
+        self.batches = {}
+        self.requests = 0
+        self.recent_prompts = deque(maxlen=PROMPT_CACHE_ENTRIES)
+        self.lock = threading.Lock()
+
+    def cached_tokens(self, request):
+        """Simulate the prompt cache for a request and return its cached prompt tokens.
+
+        The cached part is the longest prefix shared with one of the most recent
+        requests, in whole blocks from PROMPT_CACHE_MIN_TOKENS tokens on, at 4 characters
+        per token. This is a single cache: routing by prompt_cache_key is not simulated.
+        """
+        text = prompt_text(request)
+        with self.lock:
+            recent = list(self.recent_prompts)
+            self.recent_prompts.append(text)
+        shared = max((len(os.path.commonprefix([previous, text])) for previous in recent), default=0) // 4
+        if shared < PROMPT_CACHE_MIN_TOKENS:
+            return 0
+        return shared // PROMPT_CACHE_BLOCK_TOKENS * PROMPT_CACHE_BLOCK_TOKENS
+
+    def add_file(self, content, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        with self.lock:
+            self.files[file_id] = content
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": f"{file_id}.jsonl", "purpose": purpose, "status": "processed"}
+
+
+def make_handler(settings, state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; with Nagle's algorithm on, each response
+        # would wait about 40 ms for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, headers=None, raw=None):
+            data = raw if raw is not None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json" if raw is None else "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status, message, code, headers=None):
+            self._send(status, {"error": {"message": message, "type": code, "code": code}}, headers)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_POST(self):
+            body = self._body()
+            if self.path.endswith("/chat/completions"):
+                self._chat(json.loads(body))
+            elif self.path.endswith("/files"):
+                content = _multipart_file(body, self.headers["Content-Type"])
+                self._send(200, state.add_file(content, "batch"))
+            elif self.path.endswith("/batches"):
+                self._send(200, self._create_batch(json.loads(body)))
+            else:
+                self._error(404, f"Unknown path {self.path}", "not_found")
+
+        def do_GET(self):
+            match = re.search(r"/batches/([\w-]+)$", self.path)
+            if match and match.group(1) in state.batches:
+                self._send(200, state.batches[match.group(1)])
+                return
+            match = re.search(r"/files/([\w-]+)/content$", self.path)
+            if match and match.group(1) in state.files:
+                self._send(200, None, raw=state.files[match.group(1)])
+                return
+            self._error(404, f"Unknown path {self.path}", "not_found")
+
+        def _chat(self, request):
+            with state.lock:
+                state.requests += 1
+            latency, outcome = settings.draw()
+            time.sleep(latency)
+            if outcome == "429":
+                self._error(429, "Rate limit reached (mock)", "rate_limit_exceeded",
+                            {"retry-after": str(settings.retry_after)})
+            elif outcome == "500":
+                self._error(500, "Internal error (mock)", "server_error")
+            else:
+                cached_tokens = state.cached_tokens(request) if settings.prompt_cache else None
+                self._send(200, completion_body(settings, request, cached_tokens), {
+                    "x-ratelimit-limit-requests": str(settings.requests_per_minute),
+                    "x-ratelimit-remaining-requests": str(settings.requests_per_minute - 1),
+                    "x-ratelimit-reset-requests": "1s",
+                    "x-ratelimit-limit-tokens": str(settings.tokens_per_minute),
+                    "x-ratelimit-remaining-tokens": str(settings.tokens_per_minute - 1),
+                    "x-ratelimit-reset-tokens": "1s"
+                })
+
+        def _create_batch(self, request):
+            # The whole batch is answered at once, so it is complete when first polled
+            lines = state.files[request["input_file_id"]].decode("utf-8").splitlines()
+            output = []
+            for line in lines:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                cached_tokens = state.cached_tokens(record["body"]) if settings.prompt_cache else None
+                output.append(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": record["custom_id"],
+                    "response": {"status_code": 200, "body": completion_body(settings, record["body"], cached_tokens)},
+                    "error": None
+                }))
+            output_file = state.add_file(("\n".join(output) + "\n").encode("utf-8"), "batch_output")
+            batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+            batch = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": request["endpoint"],
+                "input_file_id": request["input_file_id"],
+                "completion_window": request["completion_window"],
+                "status": "completed",
+                "output_file_id": output_file["id"],
+                "error_file_id": None,
+                "created_at": int(time.time()),
+                "request_counts": {"total": len(output), "completed": len(output), "failed": 0}
+            }
+            with state.lock:
+                state.batches[batch_id] = batch
+            return batch
+
+    return Handler
+
+
+class MockOpenAIServer:
+    """Runs the mock API on a background thread; usable as a context manager."""
+
+    def __init__(self, settings=None, host="127.0.0.1", port=0):
+        self.settings = settings or MockSettings()
+        self.state = MockState()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.settings, self.state))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_settings_arguments(parser):
+    """Add the options that configure MockSettings to an argument parser."""
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="median response time in ms (default: 50)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="spread of the log-normal response time (default: 0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500 (default: 0)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with a 429 (default: 0)")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="retry-after seconds sent with 429s (default: 0.5)")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="tokens in every completion (default: 120)")
+    parser.add_argument("--cached-fraction", type=float, default=0.0, help="share of prompt tokens reported as cached (default: 0)")
+    parser.add_argument("--prompt-cache", action="store_true", help="simulate the prompt cache instead of --cached-fraction")
+
+
+def settings_from_args(args):
+    return MockSettings(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        completion_tokens=args.completion_tokens,
+        cached_fraction=args.cached_fraction,
+        prompt_cache=args.prompt_cache
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(settings_from_args(args), args.host, args.port)
+    print(f"Mock OpenAI server listening; set OPENAI_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
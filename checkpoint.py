@@ -0,0 +1,117 @@
+"""
+Checkpoint - Crash-safe journal of completed pairs for recombine.py
+
+Every successfully generated pair is appended to a JSON Lines journal next to the output
+file, so a crash, Ctrl-C or sleep does not throw away the API calls already paid for.
+Running recombine.py again with --resume reloads the journal and only generates the
+pairs that are still missing.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+# How often the journal is forced to disk; every record is flushed to the OS regardless
+FSYNC_EVERY_RECORDS = 50
+FSYNC_EVERY_SECONDS = 5.0
+
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def run_key(generation_goal, user_context, model, condense_max_chars=None):
+    """Identify the settings a journal was written with."""
+    if condense_max_chars is None:
+        return _digest(generation_goal, user_context, model)
+    return _digest(generation_goal, user_context, model, condense_max_chars)
+
+
+def pair_key(prompt1, prompt2):
+    """Identify the prompt texts a pair was generated from."""
+    return _digest(prompt1, prompt2)
+
+
+def journal_path(output_file):
+    """Return the journal file used for an output file."""
+    return f"{output_file}.journal.jsonl"
+
+
+class CheckpointJournal:
+    """Append-only JSONL journal of completed pairs.
+
+    Records are keyed by source IDs plus a hash of the two prompt texts, and only records
+    written with the same run key (goal, context and model) are ever reloaded.
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.file = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def load(self):
+        """Return {(prompt_id1, prompt_id2, pair_key): text} for this run's records."""
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write can leave a truncated last line
+                    continue
+                if record.get("run") != self.key:
+                    continue
+                id1, id2 = record["ids"]
+                completed[(id1, id2, record["pair"])] = record["text"]
+        return completed
+
+    def open(self, resume=False):
+        """Open the journal for appending, starting a fresh one unless resuming."""
+        # Make sure a truncated last line cannot swallow the next record
+        needs_newline = False
+        if resume and os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self.file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if needs_newline:
+            self.file.write("\n")
+        return self
+
+    def record(self, prompt_id1, prompt_id2, prompt1, prompt2, text):
+        """Append one completed pair."""
+        line = json.dumps({
+            "run": self.key,
+            "ids": [prompt_id1, prompt_id2],
+            "pair": pair_key(prompt1, prompt2),
+            "text": text
+        })
+        self.file.write(line + "\n")
+        self.file.flush()
+        self.unsynced += 1
+        if (self.unsynced >= FSYNC_EVERY_RECORDS
+                or time.monotonic() - self.last_sync >= FSYNC_EVERY_SECONDS):
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.file.flush()
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
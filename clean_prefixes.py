@@ -2,15 +2,25 @@
 Clean Prefixes - Post-processing script for recombine.py output
 
 This script removes common prefixes like "Problem Statement:", "Opportunity:", etc. 
-from the generated prompts in an Excel file.
+from the generated prompts in an Excel, CSV, JSONL or Parquet file. All prefixes are
+matched with one precompiled regex applied to whole columns, and CSV, JSONL and
+Parquet files are cleaned in chunks, so large files never have to fit in memory.
+
+Usage:
+    python clean_prefixes.py [input output] [--prefixes prefixes.txt]
 """
 
+import argparse
+import re
+
 import pandas as pd
-from tkinter import Tk, filedialog
+from pandas.api.types import is_object_dtype, is_string_dtype
 from pathlib import Path
 
 def select_file(title, file_types, save=False):
     """Open a file dialog to select a file."""
+    from tkinter import Tk, filedialog
+    
     root = Tk()
     root.withdraw()  # Hide the main window
     
@@ -34,74 +44,174 @@ def select_file(title, file_types, save=False):
     finally:
         root.destroy()
 
-def clean_text(text):
+# Prefixes removed when no --prefixes file is given
+DEFAULT_PREFIXES = [
+    "Problem Statement:", 
+    "Opportunity:", 
+    "Solution:", 
+    "Insight:", 
+    "Problem:",
+    "Observation:"
+]
+
+# Rows per chunk when cleaning CSV, JSONL and Parquet files
+CHUNK_ROWS = 100_000
+
+def load_prefixes(path):
+    """Read prefixes from a text file, one per line; blank lines and # comments are ignored."""
+    with open(path, encoding="utf-8") as f:
+        prefixes = [line.strip() for line in f]
+    return [prefix for prefix in prefixes if prefix and not prefix.startswith("#")]
+
+def compile_prefix_pattern(prefixes):
+    """Compile one case-insensitive regex matching any prefix at the start of the text.
+
+    Leading whitespace and the whitespace after the prefix are matched too. Longer
+    prefixes are tried first, so "Problem Statement:" wins over "Problem:". The flag is
+    written inline as (?i) so that the pattern text alone is complete (see clean_series).
+    """
+    alternatives = "|".join(re.escape(prefix) for prefix in sorted(prefixes, key=len, reverse=True))
+    return re.compile(rf"(?i)^\s*(?:{alternatives})\s*")
+
+PREFIX_PATTERN = compile_prefix_pattern(DEFAULT_PREFIXES)
+
+def clean_text(text, pattern=PREFIX_PATTERN):
     """Remove common prefixes from generated text."""
     if not isinstance(text, str):
         return text
+    return pattern.sub("", text, count=1)
+
+def clean_series(prompts, pattern=PREFIX_PATTERN):
+    """Remove prefixes from a whole column at once; non-string cells are kept as they are."""
+    # A chunk read as all-NaN or numbers has no .str accessor and nothing to clean
+    if not (is_object_dtype(prompts) or is_string_dtype(prompts)):
+        return prompts
+    # Arrow-backed strings keep their dtype; anything else may mix in non-strings
+    texts = prompts if isinstance(prompts.dtype, pd.StringDtype) else prompts.astype(object)
+    # Passing the pattern text rather than the compiled object lets pandas run it inside
+    # pyarrow for Arrow-backed strings instead of calling re once per cell
+    cleaned = texts.str.replace(pattern.pattern, "", n=1, regex=True)
+    # The .str accessor turns non-strings into NaN, so put the original values back
+    return cleaned.fillna(prompts)
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Return (metadata, chunks) for an input file; chunks are dataframes of up to chunk_rows rows.
+
+    Excel workbooks cannot be streamed and come back as a single chunk. Metadata is
+    the Parquet schema metadata (run details), empty for other formats.
+    """
+    extension = Path(path).suffix.lower()
+    if extension == ".csv":
+        return {}, pd.read_csv(path, chunksize=chunk_rows)
+    if extension == ".jsonl":
+        return {}, pd.read_json(path, lines=True, chunksize=chunk_rows)
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
         
-    prefixes = [
-        "Problem Statement:", 
-        "Opportunity:", 
-        "Solution:", 
-        "Insight:", 
-        "Problem:",
-        "Observation:"
-    ]
+        parquet_file = pq.ParquetFile(path)
+        batches = parquet_file.iter_batches(batch_size=chunk_rows)
+        return parquet_file.schema_arrow.metadata or {}, (batch.to_pandas() for batch in batches)
+    return {}, [pd.read_excel(path)]
+
+def write_excel(df, path):
+    """Save to Excel with adjusted column widths."""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False)
+        worksheet = writer.sheets['Sheet1']
+        
+        # Set column widths (adjust as needed)
+        worksheet.column_dimensions['A'].width = 5   # #
+        worksheet.column_dimensions['B'].width = 15  # Source IDs
+        worksheet.column_dimensions['C'].width = 20  # Prompt Type
+        worksheet.column_dimensions['D'].width = 50  # Prompt
+
+class ChunkWriter:
+    """Writes cleaned chunks to CSV, JSONL or Parquet as they come; Excel is written on close."""
     
-    # Convert to lowercase for case-insensitive matching
-    text_lower = text.lstrip()
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = metadata or {}
+        self.extension = Path(path).suffix.lower()
+        self.rows = 0
+        self.parquet_writer = None
+        self.excel_chunks = []
     
-    for prefix in prefixes:
-        if text_lower.lower().startswith(prefix.lower()):
-            return text[len(prefix):].lstrip()
+    def write(self, df):
+        if self.extension == ".csv":
+            df.to_csv(self.path, mode="w" if not self.rows else "a", header=not self.rows, index=False)
+        elif self.extension == ".jsonl":
+            df.to_json(self.path, mode="w" if not self.rows else "a", orient="records", lines=True, force_ascii=False)
+        elif self.extension == ".parquet":
+            self._write_parquet(df)
+        else:
+            self.excel_chunks.append(df)
+        self.rows += len(df)
     
-    return text
+    def _write_parquet(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.parquet_writer is None:
+            # Keep the original file's run metadata
+            schema = table.schema.with_metadata({**self.metadata, **(table.schema.metadata or {})})
+            self.parquet_writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+        self.parquet_writer.write_table(table.cast(self.parquet_writer.schema))
+    
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+        if self.excel_chunks:
+            write_excel(pd.concat(self.excel_chunks, ignore_index=True), self.path)
+
+def clean_file(input_file, output_file, pattern=PREFIX_PATTERN, chunk_rows=CHUNK_ROWS):
+    """Clean the Prompt column of input_file chunk by chunk into output_file; returns the row count."""
+    metadata, chunks = read_chunks(input_file, chunk_rows)
+    writer = ChunkWriter(output_file, metadata)
+    try:
+        for chunk in chunks:
+            if "Prompt" not in chunk.columns:
+                raise ValueError("Input file must contain a 'Prompt' column")
+            chunk["Prompt"] = clean_series(chunk["Prompt"], pattern)
+            writer.write(chunk)
+    finally:
+        writer.close()
+    return writer.rows
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove common prefixes from generated prompts.")
+    parser.add_argument("input", nargs="?", help="file to clean (.xlsx, .csv, .jsonl or .parquet); asked for with a dialog if omitted")
+    parser.add_argument("output", nargs="?", help="cleaned file to write; asked for with a dialog if omitted")
+    parser.add_argument("--prefixes", help="text file with one prefix per line, replacing the default list")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"rows cleaned at a time (default: {CHUNK_ROWS})")
+    args = parser.parse_args(argv)
+    
+    file_types = [
+        ("Excel files", "*.xlsx"),
+        ("CSV files", "*.csv"),
+        ("JSON Lines files", "*.jsonl"),
+        ("Parquet files", "*.parquet"),
+        ("All files", "*.*")
+    ]
+    
     # Select input file
-    input_file = select_file(
-        "Select Input Excel File",
-        [("Excel files", "*.xlsx"), ("All files", "*.*")]
-    )
+    input_file = args.input or select_file("Select Input File", file_types)
     
     if not input_file:
         print("No input file selected. Exiting...")
         return
-        
+    
+    # Select output file
+    output_file = args.output or select_file("Select Output File Location", file_types, save=True)
+    
+    if not output_file:
+        print("No output file selected. Exiting...")
+        return
+    
     try:
-        # Read the Excel file
-        df = pd.read_excel(input_file)
-        
-        if "Prompt" not in df.columns:
-            print("Error: Input file must contain a 'Prompt' column")
-            return
-            
-        # Clean the prompts
-        df["Prompt"] = df["Prompt"].apply(clean_text)
-        
-        # Select output file
-        output_file = select_file(
-            "Select Output File Location",
-            [("Excel files", "*.xlsx"), ("All files", "*.*")],
-            save=True
-        )
-        
-        if not output_file:
-            print("No output file selected. Exiting...")
-            return
-            
-        # Save to Excel with adjusted column widths
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False)
-            worksheet = writer.sheets['Sheet1']
-            
-            # Set column widths (adjust as needed)
-            worksheet.column_dimensions['A'].width = 5   # #
-            worksheet.column_dimensions['B'].width = 15  # Source IDs
-            worksheet.column_dimensions['C'].width = 20  # Prompt Type
-            worksheet.column_dimensions['D'].width = 50  # Prompt
-            
-        print(f"Cleaning complete! Output saved to: {output_file}")
+        pattern = compile_prefix_pattern(load_prefixes(args.prefixes)) if args.prefixes else PREFIX_PATTERN
+        rows = clean_file(input_file, output_file, pattern, args.chunk_rows)
+        print(f"Cleaning complete! {rows} rows saved to: {output_file}")
         
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -0,0 +1,274 @@
+"""
+Dedupe Outputs - Near-duplicate detection for recombine.py output
+
+At large N many pairs produce nearly identical texts. This script finds them without
+comparing every text with every other one: each Prompt is reduced to a MinHash
+signature of its word shingles, signatures are bucketed with an LSH banding index,
+and only texts that share a bucket are compared. Pairs whose estimated Jaccard
+similarity reaches the threshold are joined into clusters with a union-find.
+
+Two columns are added to the output:
+- Cluster ID  rows with the same ID are near-duplicates (numbered by first appearance)
+- Novelty     1 minus the highest similarity found to any other row, so 1.0 means
+              nothing similar was found and 0.0 means an exact duplicate exists
+
+Everything runs in NumPy and works in roughly linear time, so hundreds of thousands
+of outputs take seconds to minutes.
+
+Usage:
+    python dedupe_outputs.py results.xlsx results-dedup.xlsx [--threshold 0.8] [--drop-duplicates]
+"""
+
+import argparse
+import re
+import sys
+
+import numpy as np
+
+from clean_prefixes import CHUNK_ROWS, ChunkWriter, read_chunks
+
+# Number of hash functions per signature
+NUM_PERM = 128
+
+# Words per shingle
+SHINGLE_SIZE = 3
+
+# Estimated Jaccard similarity at which two texts count as near-duplicates
+THRESHOLD = 0.8
+
+# Shingles hashed at once while computing signatures; bounds the temporary
+# (shingles x NUM_PERM) array to about 100 MB
+SHINGLES_PER_BLOCK = 100_000
+
+# Candidate pairs whose signatures are compared at once
+PAIRS_PER_BLOCK = 200_000
+
+# Probability with which a pair at the threshold must become an LSH candidate
+MIN_RECALL = 0.95
+
+_PAD = (1 << 32) - 1
+_WORD = re.compile(r"\w+")
+
+
+def choose_bands(num_perm, threshold, min_recall=MIN_RECALL):
+    """Pick (bands, rows) with bands * rows == num_perm for an LSH index.
+
+    Texts with similarity s share at least one band bucket with probability
+    1 - (1 - s^rows)^bands. The longest bands (fewest false candidates) are chosen
+    that still catch a pair at the threshold with probability `min_recall`;
+    candidates are checked against their signatures afterwards anyway.
+    """
+    options = [(num_perm // rows, rows) for rows in range(num_perm, 0, -1) if num_perm % rows == 0]
+    for bands, rows in options:
+        if 1 - (1 - threshold ** rows) ** bands >= min_recall:
+            return bands, rows
+    return options[-1]
+
+
+class MinHasher:
+    """Computes MinHash signatures of word shingles for batches of texts."""
+
+    def __init__(self, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Multiply-shift hashing: the top 32 bits of (a * x + b) mod 2^64, with odd a
+        self.a = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+        # Words are numbered as they are first seen, across all batches
+        self.vocabulary = {}
+
+    def _shingles(self, texts):
+        """Return (shingle hashes, shingles per text) for a batch of texts.
+
+        Each text is padded with shingle_size - 1 filler words, so a text of L words
+        yields L shingles and even one-word texts get a signature.
+        """
+        vocabulary = self.vocabulary
+        padding = [_PAD] * (self.shingle_size - 1)
+        words = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for index, text in enumerate(texts):
+            if not isinstance(text, str):
+                continue
+            ids = [vocabulary.setdefault(word, len(vocabulary)) for word in _WORD.findall(text.lower())]
+            if ids:
+                words.extend(ids)
+                words.extend(padding)
+                lengths[index] = len(ids)
+
+        words = np.array(words, dtype=np.uint64)
+        shingles = np.zeros(len(words), dtype=np.uint64)
+        for offset in range(self.shingle_size):
+            shingles = shingles * np.uint64(0x9E3779B1) + np.roll(words, -offset)
+
+        # Keep only shingles that start on a real word; the padding keeps them inside their text
+        real = lengths[lengths > 0]
+        padded = real + self.shingle_size - 1
+        first_word = np.repeat(np.cumsum(padded) - padded, real)
+        word_in_text = np.arange(real.sum()) - np.repeat(np.cumsum(real) - real, real)
+        shingles = shingles[first_word + word_in_text]
+        return (shingles ^ (shingles >> np.uint64(32))) & np.uint64(0xFFFFFFFF), lengths
+
+    def signatures(self, texts):
+        """Return (signatures, has_words) for a batch of texts.
+
+        Signatures are a (len(texts), num_perm) uint32 array. Texts without any words
+        (including missing values) have has_words False and an all-max signature.
+        """
+        shingles, lengths = self._shingles(texts)
+        signatures = np.full((len(texts), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        texts_with_words = np.flatnonzero(lengths)
+        ends = np.cumsum(lengths[texts_with_words])
+        starts = ends - lengths[texts_with_words]
+
+        # Hash whole texts at a time, in blocks of about SHINGLES_PER_BLOCK shingles
+        first = 0
+        while first < len(texts_with_words):
+            last = max(first + 1, int(np.searchsorted(ends, starts[first] + SHINGLES_PER_BLOCK, side="right")))
+            block = shingles[starts[first]:ends[last - 1]]
+            # Permutations along the rows keep each text's shingles contiguous for reduceat
+            hashes = (self.a * block + self.b) >> np.uint64(32)
+            minima = np.minimum.reduceat(hashes, starts[first:last] - starts[first], axis=1)
+            signatures[texts_with_words[first:last]] = minima.T
+            first = last
+        return signatures, lengths > 0
+
+
+def candidate_pairs(signatures, bands, rows):
+    """Return (u, v) index arrays of texts that share a bucket in at least one band."""
+    multipliers = np.random.default_rng(0).integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    pairs = []
+    for band in range(bands):
+        keys = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64) @ multipliers
+        order = np.argsort(keys, kind="stable")
+        # Neighbours in sorted order with the same key share a bucket; chaining them
+        # keeps each bucket connected without listing all of its pairs
+        same = keys[order][1:] == keys[order][:-1]
+        pairs.append(np.stack([order[:-1][same], order[1:][same]]))
+    pairs = np.concatenate(pairs, axis=1) if pairs else np.empty((2, 0), dtype=np.int64)
+    # The same pair usually turns up in several bands
+    n = len(signatures)
+    unique = np.unique(pairs.min(axis=0) * n + pairs.max(axis=0))
+    return unique // n, unique % n
+
+
+def estimated_similarity(signatures, u, v):
+    """Estimated Jaccard similarity of each candidate pair: the share of equal signature values."""
+    similarity = np.empty(len(u))
+    for first in range(0, len(u), PAIRS_PER_BLOCK):
+        block = slice(first, first + PAIRS_PER_BLOCK)
+        similarity[block] = (signatures[u[block]] == signatures[v[block]]).mean(axis=1)
+    return similarity
+
+
+def connected_components(n, u, v):
+    """Label each of n items with the smallest index in its component (union-find over edges)."""
+    parent = np.arange(n)
+    while True:
+        # Hook: attach the larger root of every edge to the smaller one
+        root_u, root_v = parent[u], parent[v]
+        low = np.minimum(root_u, root_v)
+        np.minimum.at(parent, root_u, low)
+        np.minimum.at(parent, root_v, low)
+        # Compress: point every item straight at its root
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        if np.array_equal(parent[u], parent[v]):
+            return parent
+
+
+def find_near_duplicates(signatures, threshold=THRESHOLD, has_words=None):
+    """Cluster texts by their signatures; returns (cluster IDs, novelty scores).
+
+    Cluster IDs are 1-based and numbered by first appearance. Texts without words
+    (`has_words` False) each form their own cluster and have NaN novelty.
+    """
+    n, num_perm = signatures.shape
+    bands, rows = choose_bands(num_perm, threshold)
+    if has_words is None:
+        has_words = np.ones(n, dtype=bool)
+    indexed = np.flatnonzero(has_words)
+
+    u, v = candidate_pairs(signatures[indexed], bands, rows)
+    u, v = indexed[u], indexed[v]
+    similarity = estimated_similarity(signatures, u, v)
+
+    # Novelty looks at every candidate, clustering only at pairs above the threshold
+    best = np.zeros(n)
+    np.maximum.at(best, u, similarity)
+    np.maximum.at(best, v, similarity)
+    novelty = np.where(has_words, 1.0 - best, np.nan)
+
+    duplicate = similarity >= threshold
+    roots = connected_components(n, u[duplicate], v[duplicate])
+    _, cluster_ids = np.unique(roots, return_inverse=True)
+    return cluster_ids + 1, novelty
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate prompts in recombine.py output.")
+    parser.add_argument("input", help="recombine output (.xlsx, .csv, .jsonl or .parquet)")
+    parser.add_argument("output", help="file to write with Cluster ID and Novelty columns added")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help=f"estimated Jaccard similarity of word {SHINGLE_SIZE}-grams at which texts are near-duplicates (default: {THRESHOLD})"
+    )
+    parser.add_argument("--num-perm", type=int, default=NUM_PERM, help=f"MinHash signature length (default: {NUM_PERM})")
+    parser.add_argument("--shingle-size", type=int, default=SHINGLE_SIZE, help=f"words per shingle (default: {SHINGLE_SIZE})")
+    parser.add_argument("--drop-duplicates", action="store_true", help="only write the first row of every cluster")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"rows read and written at a time (default: {CHUNK_ROWS})")
+    args = parser.parse_args(argv)
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold must be between 0 and 1")
+
+    try:
+        # First pass: signatures of the Prompt column only
+        hasher = MinHasher(args.num_perm, args.shingle_size)
+        signatures = []
+        has_words = []
+        _, chunks = read_chunks(args.input, args.chunk_rows)
+        for chunk in chunks:
+            if "Prompt" not in chunk.columns:
+                print("Error: Input file must contain a 'Prompt' column")
+                sys.exit(1)
+            chunk_signatures, chunk_has_words = hasher.signatures(chunk["Prompt"].tolist())
+            signatures.append(chunk_signatures)
+            has_words.append(chunk_has_words)
+        signatures = np.concatenate(signatures) if signatures else np.empty((0, args.num_perm), dtype=np.uint32)
+        has_words = np.concatenate(has_words) if has_words else np.empty(0, dtype=bool)
+
+        cluster_ids, novelty = find_near_duplicates(signatures, args.threshold, has_words)
+
+        # Second pass: copy every row with the new columns
+        first_of_cluster = np.zeros(len(cluster_ids), dtype=bool)
+        first_of_cluster[np.unique(cluster_ids, return_index=True)[1]] = True
+        metadata, chunks = read_chunks(args.input, args.chunk_rows)
+        writer = ChunkWriter(args.output, metadata)
+        position = 0
+        try:
+            for chunk in chunks:
+                rows = slice(position, position + len(chunk))
+                chunk["Cluster ID"] = cluster_ids[rows]
+                chunk["Novelty"] = np.round(novelty[rows], 3)
+                if args.drop_duplicates:
+                    chunk = chunk[first_of_cluster[rows]]
+                writer.write(chunk)
+                position = rows.stop
+        finally:
+            writer.close()
+    except Exception as e:
+        print(f"Error finding duplicates: {str(e)}")
+        sys.exit(1)
+
+    clusters = len(np.unique(cluster_ids))
+    print(f"{len(cluster_ids)} rows in {clusters} clusters; {len(cluster_ids) - clusters} near-duplicates of an earlier row")
+    print(f"Output saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+Dialogs - Tk front end for recombine.py
+
+The windows that ask for the generation goal, optional context, prompt selection and
+input/output files when recombine.py is run without the command line options that
+answer those questions.
+"""
+
+from tkinter import Tk, filedialog, messagebox
+import tkinter as tk
+
+class GoalSelector:
+    def __init__(self):
+        self.root = tk.Tk()
+        self.root.title("Set Generation Goal")
+        self.goal = None
+        
+        # Window size and position
+        window_width = 500
+        window_height = 250
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - window_width) // 2
+        y = (screen_height - window_height) // 2
+        self.root.geometry(f"{window_width}x{window_height}+{x}+{y}")
+        
+        # Label
+        label = tk.Label(
+            self.root,
+            text="Enter the goal for combining prompts\n(What should the generated text aim to achieve?):",
+            pady=10
+        )
+        label.pack()
+        
+        # Default goal text
+        default_goal = "to provide a new prompt that is novel, insightful, and actionable"
+        
+        # Text input
+        self.text_input = tk.Text(self.root, height=4, width=50)
+        self.text_input.insert("1.0", default_goal)
+        self.text_input.pack(pady=10, padx=20)
+        
+        # Character counter
+        char_counter = tk.Label(self.root, text=f"{len(default_goal)}/500 characters")
+        char_counter.pack()
+        
+        def update_counter(event=None):
+            current = len(self.text_input.get("1.0", tk.END).strip())
+            char_counter.config(text=f"{current}/500 characters")
+            
+        self.text_input.bind("<KeyRelease>", update_counter)
+        
+        # Buttons frame
+        button_frame = tk.Frame(self.root)
+        button_frame.pack(pady=20)
+        
+        # Submit button
+        submit_btn = tk.Button(
+            button_frame,
+            text="Submit",
+            width=10,
+            command=self.validate_and_submit
+        )
+        submit_btn.pack(side=tk.LEFT, padx=10)
+        
+        # Cancel button
+        cancel_btn = tk.Button(
+            button_frame,
+            text="Cancel",
+            width=10,
+            command=lambda: self.finish(None)
+        )
+        cancel_btn.pack(side=tk.LEFT, padx=10)
+        
+    def validate_and_submit(self):
+        text = self.text_input.get("1.0", tk.END).strip()
+        if len(text) > 500:
+            tk.messagebox.showerror(
+                "Error",
+                "Goal text must be 500 characters or less."
+            )
+            return
+        if not text:
+            tk.messagebox.showerror(
+                "Error",
+                "Goal text cannot be empty."
+            )
+            return
+        self.finish(text)
+        
+    def finish(self, goal):
+        self.goal = goal
+        self.root.quit()
+        
+    def get_goal(self):
+        self.root.mainloop()
+        self.root.destroy()
+        return self.goal
+
+class ContextSelector:
+    def __init__(self):
+        self.root = tk.Tk()
+        self.root.title("Add Context")
+        self.context = None
+        
+        # Window size and position
+        window_width = 400
+        window_height = 150
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - window_width) // 2
+        y = (screen_height - window_height) // 2
+        self.root.geometry(f"{window_width}x{window_height}+{x}+{y}")
+        
+        # Label
+        label = tk.Label(self.root, text="Would you like to add context for the LLM\nto guide the output generation?", pady=10)
+        label.pack()
+        
+        # Buttons frame
+        button_frame = tk.Frame(self.root)
+        button_frame.pack(pady=20)
+        
+        # Yes/No buttons
+        yes_btn = tk.Button(
+            button_frame,
+            text="Yes",
+            width=10,
+            command=self.show_context_input
+        )
+        yes_btn.pack(side=tk.LEFT, padx=10)
+        
+        no_btn = tk.Button(
+            button_frame,
+            text="No",
+            width=10,
+            command=lambda: self.finish(None)
+        )
+        no_btn.pack(side=tk.LEFT, padx=10)
+        
+    def show_context_input(self):
+        # Clear current window contents
+        for widget in self.root.winfo_children():
+            widget.destroy()
+            
+        # Add new input elements
+        label = tk.Label(
+            self.root,
+            text="Enter structure and format instructions for the LLM (max 3000 characters):",
+            pady=10
+        )
+        label.pack()
+        
+        # Text input
+        text_input = tk.Text(self.root, height=4, width=40)
+        text_input.pack(pady=10, padx=20)
+        
+        # Character counter
+        char_counter = tk.Label(self.root, text="0/3000 characters")
+        char_counter.pack()
+        
+        def update_counter(event=None):
+            current = len(text_input.get("1.0", tk.END).strip())
+            char_counter.config(text=f"{current}/3000 characters")
+            
+        text_input.bind("<KeyRelease>", update_counter)
+        
+        # Submit button
+        submit_btn = tk.Button(
+            self.root,
+            text="Submit",
+            width=10,
+            command=lambda: self.validate_and_submit(text_input.get("1.0", tk.END))
+        )
+        submit_btn.pack(pady=10)
+        
+    def validate_and_submit(self, text):
+        text = text.strip()
+        if len(text) > 3000:
+            tk.messagebox.showerror(
+                "Error",
+                "Context must be 3000 characters or less."
+            )
+            return
+        self.finish(text)
+        
+    def finish(self, context):
+        self.context = context
+        self.root.quit()
+        
+    def get_context(self):
+        self.root.mainloop()
+        self.root.destroy()
+        return self.context
+
+class ManualPromptSelector:
+    def __init__(self, all_prompts):
+        self.root = tk.Tk()
+        self.root.title("Manual Prompt Selection")
+        self.selected_indices = None
+        self.all_prompts = all_prompts
+        
+        # Window size and position
+        window_width = 600
+        window_height = 400
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - window_width) // 2
+        y = (screen_height - window_height) // 2
+        self.root.geometry(f"{window_width}x{window_height}+{x}+{y}")
+        
+        # Instructions
+        instructions = """Enter the ID numbers of the prompts you want to combine (comma-separated).
+Example: 1,3,5,7
+Note: IDs must be between 1 and {}""".format(len(all_prompts))
+        
+        label = tk.Label(self.root, text=instructions, pady=20)
+        label.pack()
+        
+        # Display available prompts
+        prompts_frame = tk.Frame(self.root)
+        prompts_frame.pack(pady=10, padx=20, fill=tk.BOTH, expand=True)
+        
+        # Create canvas and scrollbar
+        canvas = tk.Canvas(prompts_frame)
+        scrollbar = tk.Scrollbar(prompts_frame, orient="vertical", command=canvas.yview)
+        scrollable_frame = tk.Frame(canvas)
+        
+        scrollable_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        )
+        
+        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        # List all prompts with their IDs
+        for i, prompt in enumerate(all_prompts, 1):
+            preview = prompt[:100] + "..." if len(prompt) > 100 else prompt
+            tk.Label(scrollable_frame, text=f"ID {i}: {preview}", anchor="w", justify=tk.LEFT).pack(pady=2)
+        
+        # Pack canvas and scrollbar
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        # Input field
+        self.entry = tk.Entry(self.root, width=40)
+        self.entry.pack(pady=10)
+        
+        # Buttons frame
+        button_frame = tk.Frame(self.root)
+        button_frame.pack(pady=20)
+        
+        # Submit button
+        submit_btn = tk.Button(
+            button_frame,
+            text="Submit",
+            width=10,
+            command=self.validate_and_submit
+        )
+        submit_btn.pack(side=tk.LEFT, padx=10)
+        
+        # Cancel button
+        cancel_btn = tk.Button(
+            button_frame,
+            text="Cancel",
+            width=10,
+            command=lambda: self.finish(None)
+        )
+        cancel_btn.pack(side=tk.LEFT, padx=10)
+        
+    def validate_and_submit(self):
+        try:
+            # Get and validate indices
+            indices = [int(x.strip()) for x in self.entry.get().split(',')]
+            max_id = len(self.all_prompts)
+            
+            # Check if all indices are valid
+            if not all(1 <= x <= max_id for x in indices):
+                tk.messagebox.showerror(
+                    "Error",
+                    f"All IDs must be between 1 and {max_id}"
+                )
+                return
+                
+            # Check if there are at least 2 indices
+            if len(indices) < 2:
+                tk.messagebox.showerror(
+                    "Error",
+                    "Please select at least 2 prompts"
+                )
+                return
+                
+            # Check for duplicates
+            if len(indices) != len(set(indices)):
+                tk.messagebox.showerror(
+                    "Error",
+                    "Please do not use duplicate IDs"
+                )
+                return
+                
+            self.finish(indices)
+            
+        except ValueError:
+            tk.messagebox.showerror(
+                "Error",
+                "Please enter valid numbers separated by commas"
+            )
+            
+    def finish(self, indices):
+        self.selected_indices = indices
+        self.root.quit()
+        
+    def get_selection(self):
+        self.root.mainloop()
+        self.root.destroy()
+        return self.selected_indices
+
+class PromptLimitSelector:
+    def __init__(self, total_prompts):
+        self.root = tk.Tk()
+        self.root.title("Prompt Selection Method")
+        self.choice = None
+        self.total_prompts = total_prompts
+        
+        # Window size and position
+        window_width = 400
+        window_height = 250
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - window_width) // 2
+        y = (screen_height - window_height) // 2
+        self.root.geometry(f"{window_width}x{window_height}+{x}+{y}")
+        
+        # Message
+        total_combinations = (total_prompts * (total_prompts - 1)) // 2
+        message = f"""Your dataset contains {total_prompts} prompts, which will generate
+{total_combinations} combinations.
+
+Please choose how you want to select prompts:"""
+        
+        label = tk.Label(self.root, text=message, pady=20)
+        label.pack()
+        
+        # Buttons frame
+        button_frame = tk.Frame(self.root)
+        button_frame.pack(pady=20)
+        
+        # Buttons
+        all_btn = tk.Button(
+            button_frame,
+            text=f"Use all {total_prompts}",
+            width=20,
+            command=lambda: self.finish("all")
+        )
+        all_btn.pack(pady=5)
+        
+        random_btn = tk.Button(
+            button_frame,
+            text="Use 5 random",
+            width=20,
+            command=lambda: self.finish("random")
+        )
+        random_btn.pack(pady=5)
+        
+        manual_btn = tk.Button(
+            button_frame,
+            text="Select prompts manually",
+            width=20,
+            command=lambda: self.finish("manual")
+        )
+        manual_btn.pack(pady=5)
+        
+    def finish(self, choice):
+        self.choice = choice
+        self.root.quit()
+        
+    def get_choice(self):
+        self.root.mainloop()
+        self.root.destroy()
+        return self.choice
+
+def select_file(title, file_types, save=False):
+    """Open a file dialog to select a file."""
+    root = Tk()
+    root.withdraw()  # Hide the main window
+    
+    try:
+        if save:
+            file_path = filedialog.asksaveasfilename(
+                title=title,
+                filetypes=file_types,
+                defaultextension=".xlsx"
+            )
+        else:
+            file_path = filedialog.askopenfilename(
+                title=title,
+                filetypes=file_types
+            )
+        
+        return file_path if file_path else None
+    except Exception as e:
+        print(f"Error selecting file: {str(e)}")
+        return None
+    finally:
+        root.destroy()
@@ -0,0 +1,1062 @@
+"""
+Generation - The recombine.py generation engine and library API
+
+Builds the chat messages for each pair of prompts, sends them to the OpenAI API
+(concurrently, paced by a shared rate limiter, or through the Batch API) and delivers
+the results in pair order. generate() is the entry point for using this from Python;
+run() is a whole command-line run, writing the results to an output file with its
+journal, cache, post-processing, progress display and run report. main() is the
+`recombine.py generate` command line, which asks for anything not given as an option
+with the dialogs in dialogs.py.
+
+Modules that are slow to import (the OpenAI client, NumPy, pandas, tqdm and Tk) are
+only imported once they are needed, so that starting recombine.py stays fast.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import hashlib
+import json
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from rate_limiter import RateLimiter, estimate_tokens
+from pairs import PAIR_ORDERS, PairPlan, parse_shard, select_all, select_ids, select_random
+from output_sinks import open_sink
+from checkpoint import CheckpointJournal, journal_path, pair_key, run_key
+from post_processors import POST_PROCESSORS, BackgroundWriter, PostProcessingPipeline
+from run_metrics import RunMetrics, metrics_report_path
+from response_cache import ResponseCache, cache_key
+from batch_mode import (
+    MAX_REQUESTS_PER_FILE,
+    custom_id,
+    iter_batch_results,
+    submit_batches,
+    wait_for_batches,
+    write_batch_files
+)
+
+# Load environment variables
+load_dotenv()
+
+# Generation settings
+MODEL = "gpt-4-turbo-preview"  # Using GPT-4 Turbo with 128k context window
+TEMPERATURE = 0.7
+MAX_TOKENS = 4096  # Keeping larger max_tokens since we have the context space
+DEFAULT_GOAL = "to provide a new prompt that is novel, insightful, and actionable"
+
+# Longest goal and context accepted, as in the dialogs
+MAX_GOAL_CHARS = 500
+MAX_CONTEXT_CHARS = 3000
+
+# Maximum number of API requests in flight at once
+MAX_CONCURRENCY = int(os.getenv('RECOMBINE_CONCURRENCY', '8'))
+
+# How far, in pairs per worker, the engine may run ahead of the oldest unfinished pair
+REORDER_WINDOW_PER_WORKER = 64
+
+# Account rate limits; when unset they are learned from the API response headers
+REQUESTS_PER_MINUTE = int(os.getenv('RECOMBINE_RPM', '0')) or None
+TOKENS_PER_MINUTE = int(os.getenv('RECOMBINE_TPM', '0')) or None
+
+# 429s are paced by the rate limiter, so they get a larger retry budget than other errors
+RATE_LIMIT_RETRIES = 10
+
+# Shared by every request in the process so the whole run is paced together
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+
+# Latency, retries, token usage and errors of every request in the run
+metrics = RunMetrics(MODEL)
+
+# On-disk cache of completions, so identical requests are only paid for once
+CACHE_PATH = os.getenv('RECOMBINE_CACHE', '.recombine_cache.sqlite')
+CACHE_MAX_MB = int(os.getenv('RECOMBINE_CACHE_MAX_MB', '1024'))
+CACHE_MAX_AGE_DAYS = int(os.getenv('RECOMBINE_CACHE_MAX_AGE_DAYS', '30'))
+
+def build_messages(prompt1, prompt2, user_context=None, generation_goal=None):
+    """Build the chat messages for combining two prompts.
+    
+    Everything that is the same for the whole run comes first and Prompt 1 follows, so
+    the pairs of one row share their leading tokens, which the API can serve from its
+    prompt cache. Nothing that differs between pairs may go before Prompt 1.
+    """
+    goal = generation_goal or DEFAULT_GOAL
+    
+    base_system_prompt = f"""
+    You will receive two prompts. Generate a new text that:
+    - Combines themes and elements from both prompts 
+    - Satisfies the following goal or goals: {goal}
+    - Matches the linguistic style and structure of the inputs
+    """
+    
+    # Add user context if provided
+    system_prompt = base_system_prompt
+    if user_context:
+        system_prompt = f"""
+        {base_system_prompt}
+        
+        This additional context from the User offers instructions for the structure and format of the output:
+        {user_context}
+        """
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Prompt 1: {prompt1}\nPrompt 2: {prompt2}"}
+    ]
+
+def build_condense_messages(prompt, max_chars):
+    """Build the chat messages for condensing one input prompt."""
+    system_prompt = f"""
+    You will receive a text. Condense it to at most {max_chars} characters:
+    - Keep its main idea and the specific details that make it distinctive
+    - Leave out repetition, examples that add nothing new, and filler
+    - Keep its linguistic style and structure
+    Reply with the condensed text only.
+    """
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": str(prompt)}
+    ]
+
+def request_prompts(pair, condensed=None):
+    """Return the two prompt texts to send for a pair, condensed ones where there are any."""
+    prompt1, prompt2, prompt_id1, prompt_id2 = pair
+    if condensed:
+        return condensed.get(prompt_id1, prompt1), condensed.get(prompt_id2, prompt2)
+    return prompt1, prompt2
+
+def prefix_cache_key(prompt1, user_context=None, generation_goal=None, model=MODEL):
+    """Return the prompt_cache_key for every pair with this first prompt.
+    
+    Those pairs share the system message and "Prompt 1: ..." at the start of their
+    messages. Sending them with one key routes them to the same prompt cache.
+    """
+    prefix = "\0".join((model, generation_goal or DEFAULT_GOAL, user_context or "", str(prompt1)))
+    return f"recombine-{hashlib.sha256(prefix.encode('utf-8')).hexdigest()[:32]}"
+
+async def request_completion_async(client, messages, retries=3, model=MODEL, prompt_cache_key=None):
+    """Send one chat completion request, pacing and retrying it, and return the text."""
+    import openai
+    
+    tokens = estimate_tokens(messages, MAX_TOKENS)
+    
+    attempt = 0
+    rate_limit_hits = 0
+    queue_wait = 0.0
+    while True:
+        # Wait for our share of the RPM/TPM budget before sending
+        waiting = time.monotonic()
+        await rate_limiter.acquire(tokens)
+        sent = time.monotonic()
+        queue_wait += sent - waiting
+        metrics.request_sent()
+        try:
+            raw_response = await client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                extra_body={"prompt_cache_key": prompt_cache_key} if prompt_cache_key else None
+            )
+            rate_limiter.update_from_headers(raw_response.headers)
+            response = raw_response.parse()
+            metrics.request_finished()
+            metrics.record_request(time.monotonic() - sent, queue_wait, attempt + rate_limit_hits, response.usage)
+            return response.choices[0].message.content.strip()
+            
+        except openai.RateLimitError as e:
+            metrics.request_finished(e)
+            # An exhausted quota will not recover by waiting
+            if e.code == 'insufficient_quota' or rate_limit_hits >= RATE_LIMIT_RETRIES:
+                raise
+            wait_time = rate_limiter.record_rate_limit(e.response.headers, rate_limit_hits)
+            rate_limit_hits += 1
+            print(f"Rate limit reached. Pausing requests for {wait_time:.1f} seconds...")
+        except Exception as e:
+            metrics.request_finished(e)
+            print(f"Error generating text: {str(e)}")
+            attempt += 1
+            if attempt >= retries:
+                raise
+            await asyncio.sleep(2 ** (attempt - 1))
+
+async def generate_text_async(client, prompt1, prompt2, prompt_id1, prompt_id2, user_context=None, generation_goal=None, retries=3, cache=None, model=MODEL, prefix_cache=False):
+    """Generate new text by combining two prompts, sending any request with the shared AsyncOpenAI `client`."""
+    messages = build_messages(prompt1, prompt2, user_context, generation_goal)
+    prompt_cache_key = prefix_cache_key(prompt1, user_context, generation_goal, model) if prefix_cache else None
+    
+    if cache is not None:
+        text, cached = await cache.get_or_create(
+            cache_key(model, messages, TEMPERATURE, MAX_TOKENS),
+            lambda: request_completion_async(client, messages, retries, model, prompt_cache_key)
+        )
+    else:
+        text = await request_completion_async(client, messages, retries, model, prompt_cache_key)
+        cached = False
+    metrics.record_pair("cache" if cached else "api")
+    
+    return {
+        'text': text,
+        'source_ids': f"{prompt_id1},{prompt_id2}"
+    }
+
+def generate_text(prompt1, prompt2, prompt_id1, prompt_id2, user_context=None, generation_goal=None, retries=3, cache=None, model=MODEL, prefix_cache=False):
+    """Generate new text using OpenAI API by combining two prompts; a blocking wrapper around generate_text_async."""
+    import openai
+    
+    async def generate_one():
+        # Retries are handled in request_completion_async so they go through the rate limiter
+        client = openai.AsyncOpenAI(max_retries=0)
+        try:
+            return await generate_text_async(client, prompt1, prompt2, prompt_id1, prompt_id2, user_context, generation_goal, retries, cache, model, prefix_cache)
+        finally:
+            await client.close()
+    
+    return asyncio.run(generate_one())
+
+async def generate_all(pairs, user_context=None, generation_goal=None, concurrency=MAX_CONCURRENCY, on_progress=None, on_result=None, on_output=None, cache=None, known=None, model=MODEL, prefix_cache=False, condensed=None, should_stop=None):
+    """Generate texts for many prompt pairs concurrently.
+    
+    `pairs` is an iterable of (prompt1, prompt2, prompt_id1, prompt_id2) tuples. A fixed pool
+    of workers pulls pairs from it lazily, so at most `concurrency` requests are in flight
+    at once. Results are delivered in input order, whatever order the requests complete
+    in: to `on_output(pair, result)` as soon as every earlier pair is done (if it returns
+    an awaitable, e.g. BackgroundWriter.submit when its queue is full, that is awaited
+    before the next pair is delivered), or, without
+    `on_output`, as the returned list. Workers never run more than a fixed window ahead
+    of the oldest unfinished pair, so the reorder buffer stays small however many pairs
+    there are.
+    
+    `on_progress` is called with the number of completed pairs, and `on_result` with each
+    pair and its result once it has been generated successfully. `known(pair)` may return
+    an existing result (e.g. from a resumed journal), in which case no request is made.
+    With a `cache`, identical pairs (e.g. duplicate prompts) only trigger one request.
+    With `prefix_cache`, every request carries the prefix_cache_key of its first prompt.
+    `condensed` maps row IDs to condensed prompt texts, which are sent instead of the
+    originals; callbacks still receive the original pairs.
+    
+    Once `should_stop()` returns true, workers take no more pairs. The requests in
+    flight still finish and are delivered, and the pairs delivered so far are returned.
+    """
+    import openai
+    
+    # Retries are handled in generate_text_async so they go through the rate limiter
+    client = openai.AsyncOpenAI(max_retries=0)
+    output = [] if on_output is None else None
+    reorder_buffer = {}
+    next_index = 0
+    completed = 0
+    window = max(1, concurrency) * REORDER_WINDOW_PER_WORKER
+    window_moved = asyncio.Condition()
+    # Only one worker delivers at a time, so rows stay in order while on_output waits
+    delivering = asyncio.Lock()
+    jobs = enumerate(pairs)
+    
+    async def deliver(index, pair, result):
+        nonlocal next_index
+        reorder_buffer[index] = (pair, result)
+        async with delivering:
+            while next_index in reorder_buffer:
+                ready_pair, ready_result = reorder_buffer.pop(next_index)
+                if on_output:
+                    waiting = on_output(ready_pair, ready_result)
+                    if waiting is not None:
+                        await waiting
+                else:
+                    output.append(ready_result)
+                next_index += 1
+    
+    async def worker():
+        nonlocal completed
+        # All workers share the same iterator, so each pair is taken exactly once
+        while not (should_stop and should_stop()):
+            try:
+                index, pair = next(jobs)
+            except StopIteration:
+                return
+            
+            # Wait rather than run too far ahead of the oldest unfinished pair
+            if index - next_index >= window:
+                async with window_moved:
+                    await window_moved.wait_for(lambda: index - next_index < window)
+            
+            prompt1, prompt2 = request_prompts(pair, condensed)
+            prompt_id1, prompt_id2 = pair[2], pair[3]
+            result = known(pair) if known else None
+            if result is not None:
+                metrics.record_pair("resumed")
+            else:
+                try:
+                    result = await generate_text_async(
+                        client,
+                        prompt1,
+                        prompt2,
+                        prompt_id1,
+                        prompt_id2,
+                        user_context=user_context,
+                        generation_goal=generation_goal,
+                        cache=cache,
+                        model=model,
+                        prefix_cache=prefix_cache
+                    )
+                    if on_result:
+                        on_result(pair, result)
+                except Exception as e:
+                    metrics.record_pair("failed")
+                    print(f"Error generating text for prompts {prompt_id1} and {prompt_id2}: {str(e)}")
+                    result = {
+                        'text': f"Error: {str(e)}",
+                        'source_ids': f"{prompt_id1},{prompt_id2}",
+                        'error': str(e)
+                    }
+            
+            delivered = next_index
+            await deliver(index, pair, result)
+            if next_index != delivered:
+                async with window_moved:
+                    window_moved.notify_all()
+            completed += 1
+            if on_progress:
+                on_progress(completed)
+    
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        await client.close()
+    
+    return output
+
+def generate_all_batch(pairs, work_dir, user_context=None, generation_goal=None, on_progress=None, on_result=None, on_output=None, cache=None, known=None, batch_size=MAX_REQUESTS_PER_FILE, client=None, model=MODEL, prefix_cache=False, condensed=None, should_stop=None):
+    """Generate texts for many prompt pairs through the OpenAI Batch API.
+    
+    Takes the same pairs and callbacks as generate_all and delivers results in the same
+    order; `pairs` is walked twice, so it must be re-iterable (e.g. a PairPlan). Known
+    and cached pairs are not submitted. Batch files and the record of submitted batches
+    are kept in `work_dir`, split into files of at most `batch_size` requests.
+    
+    If `should_stop()` returns true while waiting for the batches, KeyboardInterrupt is
+    raised; nothing is in flight locally, and the submitted batches are picked up again
+    from `work_dir` by the next run.
+    """
+    if client is None:
+        import openai
+        client = openai.OpenAI()
+    settings = {"model": model, "temperature": TEMPERATURE, "max_tokens": MAX_TOKENS}
+    
+    # Known and cached results are collected while writing, so we only submit what is missing
+    ready = {}
+    
+    def requests():
+        for index, pair in enumerate(pairs):
+            prompt1, prompt2 = request_prompts(pair, condensed)
+            prompt_id1, prompt_id2 = pair[2], pair[3]
+            result = known(pair) if known else None
+            if result is not None:
+                metrics.record_pair("resumed")
+                ready[index] = result
+                continue
+            messages = build_messages(prompt1, prompt2, user_context, generation_goal)
+            if cache is not None:
+                text = cache.get(cache_key(model, messages, TEMPERATURE, MAX_TOKENS))
+                if text is not None:
+                    result = {
+                        'text': text,
+                        'source_ids': f"{prompt_id1},{prompt_id2}"
+                    }
+                    if on_result:
+                        on_result(pair, result)
+                    metrics.record_pair("cache")
+                    ready[index] = result
+                    continue
+            if prefix_cache:
+                yield custom_id(index), messages, {"prompt_cache_key": prefix_cache_key(prompt1, user_context, generation_goal, model)}
+            else:
+                yield custom_id(index), messages
+    
+    paths = write_batch_files(requests(), work_dir, settings, max_requests=batch_size)
+    batch_ids = submit_batches(client, paths, os.path.join(work_dir, "batches.json"))
+    
+    def report_progress(done):
+        if should_stop and should_stop():
+            raise KeyboardInterrupt
+        if on_progress:
+            on_progress(len(ready) + done)
+    
+    batches = wait_for_batches(client, batch_ids, on_progress=report_progress)
+    
+    # Results are streamed from the result files, which are close to request order;
+    # only those that arrive before they are needed are held until then
+    batch_results = iter_batch_results(client, batches)
+    received = {}
+    
+    def result_for(index):
+        request_id = custom_id(index)
+        while request_id not in received:
+            try:
+                arrived_id, body, error, error_type = next(batch_results)
+            except StopIteration:
+                return None, "No result returned for this request", "missing_result"
+            received[arrived_id] = (body, error, error_type)
+        return received.pop(request_id)
+    
+    # Deliver results in pair order
+    output = [] if on_output is None else None
+    for index, pair in enumerate(pairs):
+        prompt1, prompt2 = request_prompts(pair, condensed)
+        prompt_id1, prompt_id2 = pair[2], pair[3]
+        result = ready.pop(index, None)
+        if result is None:
+            body, error, error_type = result_for(index)
+            metrics.record_batch_result(body.get("usage") if body is not None else None, error_type)
+            text = body["choices"][0]["message"]["content"].strip() if body is not None else None
+            if text is None:
+                metrics.record_pair("failed")
+                print(f"Error generating text for prompts {prompt_id1} and {prompt_id2}: {error}")
+                text = f"Error: {error}"
+            else:
+                metrics.record_pair("api")
+                if cache is not None:
+                    messages = build_messages(prompt1, prompt2, user_context, generation_goal)
+                    cache.put(cache_key(model, messages, TEMPERATURE, MAX_TOKENS), text)
+            result = {
+                'text': text,
+                'source_ids': f"{prompt_id1},{prompt_id2}"
+            }
+            if error is not None:
+                result['error'] = error
+            if on_result and error is None:
+                on_result(pair, result)
+        
+        if on_output:
+            on_output(pair, result)
+        else:
+            output.append(result)
+    batch_results.close()
+    
+    return output
+
+def generate(prompts, generation_goal=DEFAULT_GOAL, user_context=None, model=MODEL, mode="concurrent", concurrency=MAX_CONCURRENCY, order="row", cache=None, work_dir=None, batch_size=MAX_REQUESTS_PER_FILE, on_progress=None, on_result=None, on_output=None, known=None, prefix_cache=False, condensed=None, should_stop=None):
+    """Generate a text for every pair of prompts; the entry point for using recombine as a library.
+    
+    `prompts` is a list of prompt texts, a list of (row_id, prompt) items as returned by
+    pairs.select_ids or pairs.select_random, or a PairPlan. Pairs are generated in
+    `order`, either concurrently or, with mode="batch", through the Batch API, keeping
+    the batch files in `work_dir`. Each result is a dict with 'text' and 'source_ids',
+    plus 'error' for a pair that failed.
+    
+    Results are passed to `on_output(pair, result)` in pair order as soon as they are
+    ready, or returned as a list without `on_output`. `cache` may be a ResponseCache;
+    the other callbacks, and `should_stop`, are those of generate_all.
+    
+    With `prefix_cache`, requests carry a prompt_cache_key per first prompt, so the
+    pairs of one row reuse the provider's cached prefix. This needs the row order,
+    which sends those pairs one after the other. `condensed` maps row IDs to texts sent
+    in place of those prompts, as returned by condense_prompts().
+    """
+    if isinstance(prompts, PairPlan):
+        plan = prompts
+    else:
+        items = prompts if prompts and isinstance(prompts[0], tuple) else select_all(prompts)
+        plan = PairPlan(items, order=order)
+    if prefix_cache and plan.order != "row":
+        raise ValueError("Prefix caching needs the row order, which groups pairs by their first prompt")
+    
+    if mode == "batch":
+        if work_dir is None:
+            raise ValueError("Batch mode needs a work_dir for its request files")
+        return generate_all_batch(
+            plan,
+            work_dir,
+            user_context=user_context,
+            generation_goal=generation_goal,
+            on_progress=on_progress,
+            on_result=on_result,
+            on_output=on_output,
+            cache=cache,
+            known=known,
+            batch_size=batch_size,
+            model=model,
+            prefix_cache=prefix_cache,
+            condensed=condensed,
+            should_stop=should_stop
+        )
+    return asyncio.run(generate_all(
+        plan,
+        user_context=user_context,
+        generation_goal=generation_goal,
+        concurrency=concurrency,
+        on_progress=on_progress,
+        on_result=on_result,
+        on_output=on_output,
+        cache=cache,
+        known=known,
+        model=model,
+        prefix_cache=prefix_cache,
+        condensed=condensed,
+        should_stop=should_stop
+    ))
+
+async def condense_all(items, max_chars, concurrency=MAX_CONCURRENCY, cache=None, model=MODEL):
+    """Condense the prompts longer than `max_chars` concurrently; see condense_prompts."""
+    import openai
+    
+    # Retries are handled in request_completion_async so they go through the rate limiter
+    client = openai.AsyncOpenAI(max_retries=0)
+    jobs = iter([(row_id, prompt) for row_id, prompt in items if len(str(prompt)) > max_chars])
+    condensed = {}
+    
+    async def worker():
+        # All workers share the same iterator, so each prompt is condensed once
+        for row_id, prompt in jobs:
+            messages = build_condense_messages(prompt, max_chars)
+            try:
+                if cache is not None:
+                    text, _ = await cache.get_or_create(
+                        cache_key(model, messages, TEMPERATURE, MAX_TOKENS),
+                        lambda: request_completion_async(client, messages, model=model)
+                    )
+                else:
+                    text = await request_completion_async(client, messages, model=model)
+            except Exception as e:
+                print(f"Error condensing prompt {row_id}, sending it in full: {str(e)}")
+                continue
+            # A condensed text that is not shorter would save nothing
+            if text and len(text) < len(str(prompt)):
+                condensed[row_id] = text
+    
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        await client.close()
+    
+    return condensed
+
+def condense_prompts(items, max_chars, concurrency=MAX_CONCURRENCY, cache=None, model=MODEL):
+    """Condense every (row_id, prompt) item longer than `max_chars` characters once.
+    
+    Each prompt is sent in N-1 pairs, so condensing long prompts up front cuts the
+    tokens of the whole matrix for N extra requests. Returns {row_id: condensed text},
+    to be passed to generate() as `condensed`; prompts that could not be condensed, or
+    did not get shorter, are left out and sent in full. With a `cache`, a prompt is
+    only ever condensed once.
+    """
+    return asyncio.run(condense_all(items, max_chars, concurrency, cache, model))
+
+def condensed_path(output_file):
+    """Return the file that records which prompts were condensed for an output file."""
+    return f"{output_file}.condensed.jsonl"
+
+def write_condensed(path, items, condensed):
+    """Record the original and condensed text of every condensed prompt, as JSON Lines."""
+    with open(path, "w", encoding="utf-8") as f:
+        for row_id, prompt in items:
+            if row_id in condensed:
+                f.write(json.dumps({"id": row_id, "original": prompt, "condensed": condensed[row_id]}) + "\n")
+
+def read_prompts(path):
+    """Return the Prompt column of an input file (.xlsx, .csv, .jsonl or .parquet) as a list."""
+    from clean_prefixes import read_chunks
+    
+    _, chunks = read_chunks(path)
+    prompts = []
+    for chunk in chunks:
+        if "Prompt" not in chunk.columns:
+            raise ValueError("Input file must contain a 'Prompt' column")
+        prompts.extend(chunk["Prompt"].tolist())
+    return prompts
+
+def run(selected, output_file, generation_goal=DEFAULT_GOAL, user_context=None, model=MODEL, mode="concurrent", concurrency=MAX_CONCURRENCY, order="row", shard=None, prune_similar=None, post=(), resume=False, use_cache=True, batch_size=MAX_REQUESTS_PER_FILE, metrics_file=None, input_file=None, gui=True, prefix_cache=False, condense=None):
+    """Generate every pair of the selected (row_id, prompt) items into `output_file`.
+    
+    This is a whole recombine.py run once its settings are known: similarity pruning,
+    sharding, the checkpoint journal, the response cache, post-processing, the progress
+    display (a window if `gui` and a display are available, else the terminal) and the
+    run report. With `condense`, prompts longer than that many characters are condensed
+    first, and the originals are kept next to the output. Returns the number of rows written. Exceptions, including the
+    KeyboardInterrupt of a stopped run, are raised once the output file and journal
+    are closed.
+    """
+    post_processing = PostProcessingPipeline(post)
+    
+    # Pairs are enumerated lazily from the selected prompts and their row IDs
+    plan = PairPlan(selected, order=order)
+    
+    # Leave out pairs of near-identical prompts; they would only produce near-copies
+    pruned_pairs = set()
+    if prune_similar:
+        from prompt_similarity import find_similar_pairs
+        pruned_pairs = find_similar_pairs(selected, prune_similar)
+        plan = plan.without(lambda pair: (pair[2], pair[3]) in pruned_pairs)
+    
+    if shard:
+        plan = plan.shard(*shard)
+        print(f"\nShard {shard[0]}/{shard[1]}: pairs {plan.start + 1} to {plan.stop} of {plan.total}")
+    total_combinations = len(plan)
+    
+    pruned = 0
+    if pruned_pairs:
+        pruned = sum(1 for pair in PairPlan(plan.items, plan.order, None, plan.start, plan.stop) if (pair[2], pair[3]) in pruned_pairs)
+        print(f"\nSimilarity pruning: skipping {pruned} of {total_combinations} pairs ({pruned / max(total_combinations, 1):.1%}), saving {pruned} API calls")
+    total_combinations -= pruned
+    
+    # Reload pairs saved by an earlier, interrupted run with the same settings
+    key = run_key(generation_goal, user_context, model, condense)
+    journal = CheckpointJournal(journal_path(output_file), key)
+    completed = journal.load() if resume else {}
+    
+    def completed_key(pair):
+        prompt1, prompt2, prompt_id1, prompt_id2 = pair
+        return (prompt_id1, prompt_id2, pair_key(prompt1, prompt2))
+    
+    def resumed_result(pair):
+        text = completed.get(completed_key(pair))
+        if text is None:
+            return None
+        return {'text': text, 'source_ids': f"{pair[2]},{pair[3]}"}
+    
+    if resume:
+        already_done = sum(1 for pair in plan if completed_key(pair) in completed)
+        print(f"Resuming: {already_done} of {total_combinations} pairs already completed")
+    
+    def save_result(pair, result):
+        prompt1, prompt2, prompt_id1, prompt_id2 = pair
+        journal.record(prompt_id1, prompt_id2, prompt1, prompt2, result['text'])
+    
+    cache = None
+    if use_cache:
+        cache = ResponseCache(
+            CACHE_PATH,
+            max_bytes=CACHE_MAX_MB * 1024 * 1024,
+            max_age_days=CACHE_MAX_AGE_DAYS
+        )
+    
+    # Metrics cover this run only, and are kept live in a file if asked for
+    metrics.reset(model)
+    if metrics_file:
+        metrics.start_live(metrics_file)
+    
+    try:
+        # Send long prompts condensed in every pair, keeping the originals for provenance
+        condensed = {}
+        if condense:
+            long_prompts = sum(1 for _, prompt in plan.items if len(str(prompt)) > condense)
+            print(f"\nCondensing {long_prompts} prompts longer than {condense} characters...")
+            condensed = condense_prompts(plan.items, condense, concurrency, cache, model)
+            if condensed:
+                originals = dict(plan.items)
+                before = sum(len(str(originals[row_id])) for row_id in condensed)
+                after = sum(len(text) for text in condensed.values())
+                print(f"Condensed {len(condensed)} prompts from {before} to {after} characters in total")
+                write_condensed(condensed_path(output_file), plan.items, condensed)
+        
+        # Rows are written as soon as they are ready, in pair order
+        run_metadata = {
+            "goal": generation_goal,
+            "context_sha256": hashlib.sha256((user_context or "").encode("utf-8")).hexdigest(),
+            "model": model,
+            "created": datetime.now(timezone.utc).isoformat()
+        }
+        if post:
+            run_metadata["post_processors"] = list(post)
+        if condense:
+            run_metadata["condense_max_chars"] = condense
+        
+        def run_generation():
+            with journal.open(resume=resume), open_sink(output_file, run_metadata) as sink:
+                # Number rows by their position in the full matrix, so shards line up
+                ranks = (rank for rank, _ in plan.ranked())
+                
+                def write_row(pair, result):
+                    rank = next(ranks)
+                    # The journal and cache keep the raw text; errors are written as they are
+                    text = result['text'] if 'error' in result else post_processing(result['text'])
+                    if text is None:
+                        return
+                    started = time.perf_counter()
+                    sink.write({
+                        "#": rank + 1,
+                        "Source IDs": result['source_ids'],
+                        "Prompt": text
+                    })
+                    metrics.record_write(time.perf_counter() - started)
+                
+                # Post-processing and writing happen on their own thread, overlapping with requests
+                with BackgroundWriter(write_row) as writer:
+                    # Generate the texts, journaling each one as it completes
+                    generate(
+                        plan,
+                        generation_goal=generation_goal,
+                        user_context=user_context,
+                        model=model,
+                        mode=mode,
+                        concurrency=concurrency,
+                        cache=cache,
+                        work_dir=f"{output_file}.batch",
+                        batch_size=batch_size,
+                        on_progress=progress.update,
+                        on_result=save_result,
+                        on_output=writer.submit,
+                        known=resumed_result if completed else None,
+                        prefix_cache=prefix_cache,
+                        condensed=condensed,
+                        should_stop=lambda: progress.stop_requested
+                    )
+                # Closing is when the xlsx and parquet sinks do most of their writing
+                started = time.perf_counter()
+                sink.close()
+                metrics.record_write(time.perf_counter() - started)
+                # A stopped run ends normally once its requests in flight are written;
+                # it is reported as interrupted if pairs were left
+                if progress.stop_requested and next(ranks, None) is not None:
+                    raise KeyboardInterrupt
+            return sink.rows
+        
+        # Generation runs on a worker thread; the progress display stays responsive in this one
+        from progress import open_progress
+        progress = open_progress(total_combinations, metrics, gui=gui)
+        rows = progress.run(run_generation)
+        
+        if post_processing.filtered:
+            print(f"\nPost-processing dropped {post_processing.filtered} texts")
+        
+        if cache is not None:
+            stats = cache.stats()
+            print(f"\nResponse cache: {stats['hits']} hits, {stats['misses']} misses, {stats['coalesced']} duplicate requests coalesced")
+        
+        if shard:
+            from merge_shards import write_shard_metadata
+            write_shard_metadata(
+                output_file,
+                plan,
+                *shard,
+                run_key=key,
+                model=model,
+                input_file=os.path.basename(input_file) if input_file else None,
+                rows=rows,
+                filtered=post_processing.filtered,
+                post_processors=list(post),
+                similarity_threshold=prune_similar,
+                pruned_pairs=pruned_pairs,
+                condense_max_chars=condense
+            )
+        return rows
+    
+    finally:
+        if cache is not None:
+            cache.close()
+        metrics.stop_live()
+        
+        # Summarize the run, and keep the numbers next to the output
+        print(f"\n{metrics.report()}")
+        try:
+            metrics.write(metrics_report_path(output_file))
+        except OSError as e:
+            print(f"Error writing run report: {str(e)}")
+
+def parse_ids(text):
+    """Parse a comma-separated list of prompt row IDs, e.g. "1,3,5"."""
+    try:
+        return [int(part.strip()) for part in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected row IDs separated by commas, e.g. 1,3,5")
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(
+        description="Generate new text by combining pairs of prompts.",
+        epilog="Settings not given on the command line are asked for in dialogs. With both --input and --output, no window is opened at all and the goal, context and selection default to the built-in goal, no context and all prompts."
+    )
+    parser.add_argument(
+        "--input",
+        metavar="FILE",
+        help="input file with a 'Prompt' column (.xlsx, .csv, .jsonl or .parquet)"
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="output file; its extension (.xlsx, .csv, .jsonl or .parquet) chooses the format"
+    )
+    parser.add_argument(
+        "--goal",
+        help=f"what the generated text should aim to achieve, at most {MAX_GOAL_CHARS} characters (default: \"{DEFAULT_GOAL}\")"
+    )
+    context = parser.add_mutually_exclusive_group()
+    context.add_argument(
+        "--context",
+        help=f"context to guide the generation, at most {MAX_CONTEXT_CHARS} characters"
+    )
+    context.add_argument(
+        "--context-file",
+        metavar="FILE",
+        help="read the context from a text file"
+    )
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument(
+        "--ids",
+        type=parse_ids,
+        metavar="ID,ID,...",
+        help="only combine the prompts with these 1-based row IDs, e.g. 1,3,5"
+    )
+    selection.add_argument(
+        "--random",
+        type=int,
+        metavar="K",
+        help="only combine K prompts chosen at random"
+    )
+    selection.add_argument(
+        "--all",
+        action="store_true",
+        help="combine all prompts without asking"
+    )
+    parser.add_argument(
+        "--model",
+        default=MODEL,
+        help=f"OpenAI model to use (default: {MODEL})"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=MAX_CONCURRENCY,
+        help=f"maximum API requests in flight at once (default: {MAX_CONCURRENCY}, or RECOMBINE_CONCURRENCY)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run, skipping pairs already saved in the output file's checkpoint journal"
+    )
+    parser.add_argument(
+        "--order",
+        choices=PAIR_ORDERS,
+        default="row",
+        help="order in which pairs are generated and written (default: row)"
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="I/K",
+        help="only generate shard I of K balanced slices of the pair matrix, e.g. 2/4; merge the outputs with merge_shards.py"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always call the API instead of reusing cached completions"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["concurrent", "batch"],
+        default="concurrent",
+        help="send requests concurrently (default), or through the cheaper, slower Batch API"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help="keep live run metrics in PATH while generating: Prometheus text format if it ends in .prom, JSON otherwise"
+    )
+    parser.add_argument(
+        "--prune-similar",
+        type=float,
+        metavar="THRESHOLD",
+        help="skip pairs of prompts whose TF-IDF cosine similarity is at least THRESHOLD (e.g. 0.8), and pairs of prompts that are identical apart from case, punctuation and spacing"
+    )
+    parser.add_argument(
+        "--post",
+        action="append",
+        default=[],
+        metavar="NAME[=VALUE]",
+        help=f"post-process each text before it is written, in the order given; repeatable. One of: {', '.join(POST_PROCESSORS)}, e.g. --post strip-prefixes --post min-chars=40"
+    )
+    parser.add_argument(
+        "--prefix-cache",
+        action="store_true",
+        help="tag each request with a prompt_cache_key for its first prompt, so the pairs of one row reuse the API's cached prefix (needs --order row)"
+    )
+    parser.add_argument(
+        "--condense",
+        type=int,
+        metavar="CHARS",
+        help="condense input prompts longer than CHARS characters once before combining them, and send the condensed texts in every pair; the originals are kept in <output>.condensed.jsonl"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=MAX_REQUESTS_PER_FILE,
+        help=f"maximum requests per batch file in batch mode (default: {MAX_REQUESTS_PER_FILE})"
+    )
+    args = parser.parse_args(argv)
+    try:
+        PostProcessingPipeline(args.post)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.prune_similar is not None and not 0 < args.prune_similar <= 1:
+        parser.error("--prune-similar must be between 0 and 1")
+    if args.shard:
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.context_file:
+        try:
+            with open(args.context_file, encoding="utf-8") as f:
+                args.context = f.read().strip()
+        except OSError as e:
+            parser.error(f"cannot read --context-file: {str(e)}")
+    if args.goal is not None and not 0 < len(args.goal.strip()) <= MAX_GOAL_CHARS:
+        parser.error(f"--goal must be 1 to {MAX_GOAL_CHARS} characters")
+    if args.context is not None and len(args.context) > MAX_CONTEXT_CHARS:
+        parser.error(f"--context must be {MAX_CONTEXT_CHARS} characters or less")
+    if args.random is not None and args.random < 2:
+        parser.error("--random must be at least 2")
+    if args.random is not None and args.shard:
+        parser.error("--random cannot be sharded, as each shard would pick different prompts; use --ids or all prompts")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.condense is not None and args.condense < 1:
+        parser.error("--condense must be at least 1")
+    if args.prefix_cache and args.order != "row":
+        parser.error("--prefix-cache needs --order row, which groups pairs by their first prompt")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    # Check for API key
+    if not os.getenv('OPENAI_API_KEY'):
+        print("Error: OPENAI_API_KEY not found in .env file")
+        sys.exit(1)
+    
+    # Every setting given on the command line skips its dialog; with both files given
+    # no window is opened at all, so runs can be scripted on machines without a display
+    headless = args.input is not None and args.output is not None
+    if not headless:
+        import dialogs
+    
+    # Get generation goal
+    generation_goal = args.goal
+    if generation_goal is None and headless:
+        generation_goal = DEFAULT_GOAL
+    elif generation_goal is None:
+        goal_selector = dialogs.GoalSelector()
+        generation_goal = goal_selector.get_goal()
+        if generation_goal is None:
+            print("Operation cancelled. Exiting...")
+            sys.exit(1)
+    
+    # Get user context
+    user_context = args.context
+    if user_context is None and not headless:
+        context_selector = dialogs.ContextSelector()
+        user_context = context_selector.get_context()
+    
+    # Select input file
+    input_file = args.input
+    if input_file is None:
+        input_file = dialogs.select_file(
+            "Select Input Excel File",
+            [("Excel files", "*.xlsx"), ("All files", "*.*")]
+        )
+    if not input_file:
+        print("No input file selected. Exiting...")
+        sys.exit(1)
+    
+    # Read input data
+    try:
+        all_prompts = read_prompts(input_file)
+    except Exception as e:
+        print(f"Error reading input file: {str(e)}")
+        sys.exit(1)
+    n = len(all_prompts)
+    
+    if args.ids:
+        invalid = [row_id for row_id in args.ids if not 1 <= row_id <= n]
+        if invalid or len(args.ids) < 2 or len(args.ids) != len(set(args.ids)):
+            print(f"Error: --ids must name at least 2 different prompts between 1 and {n}")
+            sys.exit(1)
+        selected = select_ids(all_prompts, args.ids)
+    elif args.random:
+        if args.random > n:
+            print(f"Error: --random {args.random} is more than the {n} prompts in the input file")
+            sys.exit(1)
+        selected = select_random(all_prompts, args.random)
+        print(f"\nRandomly selected prompts {[row_id for row_id, _ in selected]} for analysis")
+    elif n > 5 and not headless and not args.all:
+        # If more than 5 prompts, ask user for selection method
+        limit_selector = dialogs.PromptLimitSelector(n)
+        selection_method = limit_selector.get_choice()
+        if selection_method is None:
+            print("Operation cancelled. Exiting...")
+            sys.exit(1)
+        
+        if selection_method == "random" and args.shard:
+            print("Error: random selection cannot be sharded, as each shard would pick different prompts. Use all or manual selection.")
+            sys.exit(1)
+        
+        if selection_method == "random":
+            # Randomly select 5 prompts, keeping their row IDs for reference
+            selected = select_random(all_prompts, 5)
+            selected_indices = [row_id for row_id, _ in selected]
+            print(f"\nRandomly selected prompts {selected_indices} for analysis")
+        elif selection_method == "manual":
+            # Let user manually select prompts
+            manual_selector = dialogs.ManualPromptSelector(all_prompts)
+            selected_indices = manual_selector.get_selection()
+            if selected_indices is None:
+                print("Operation cancelled. Exiting...")
+                sys.exit(1)
+            selected = select_ids(all_prompts, selected_indices)
+            print(f"\nManually selected prompts {selected_indices} for analysis")
+        else:  # "all"
+            selected = select_all(all_prompts)
+    else:
+        selected = select_all(all_prompts)
+    
+    # Select output file
+    output_file = args.output
+    if output_file is None:
+        output_file = dialogs.select_file(
+            "Select Output File Location",
+            [
+                ("Excel files", "*.xlsx"),
+                ("CSV files", "*.csv"),
+                ("JSON Lines files", "*.jsonl"),
+                ("Parquet files", "*.parquet"),
+                ("All files", "*.*")
+            ],
+            save=True
+        )
+    if not output_file:
+        print("No output file selected. Exiting...")
+        sys.exit(1)
+    
+    try:
+        run(
+            selected,
+            output_file,
+            generation_goal=generation_goal,
+            user_context=user_context,
+            model=args.model,
+            mode=args.mode,
+            concurrency=args.concurrency,
+            order=args.order,
+            shard=args.shard,
+            prune_similar=args.prune_similar,
+            post=args.post,
+            resume=args.resume,
+            use_cache=not args.no_cache,
+            batch_size=args.batch_size,
+            metrics_file=args.metrics_file,
+            input_file=input_file,
+            gui=not headless,
+            prefix_cache=args.prefix_cache,
+            condense=args.condense
+        )
+        print(f"\nGeneration complete! Output saved to: {output_file}")
+    
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. Completed pairs are saved in {journal_path(output_file)}; run again with --resume to continue.")
+        # The usual status of a process stopped by SIGINT
+        sys.exit(130)
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        sys.exit(1)
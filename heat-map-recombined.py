@@ -1,12 +1,11 @@
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import numpy as np
-from tkinter import filedialog, Tk, messagebox
-import tkinter as tk
+import argparse
+from rating_matrix import load_ratings
+from heatmap_render import render_heatmap
 
 class ScaleSelector:
     def __init__(self):
+        # Tk is only loaded when a dialog is shown, so runs given every option start without it
+        import tkinter as tk
         self.root = tk.Tk()
         self.root.title("Set Heatmap Scale")
         self.min_value = None
@@ -66,12 +65,13 @@ class ScaleSelector:
         cancel_btn.pack(side=tk.LEFT, padx=10)
         
     def validate_and_submit(self):
+        from tkinter import messagebox
         try:
             min_val = float(self.min_entry.get())
             max_val = float(self.max_entry.get())
             
             if min_val >= max_val:
-                tk.messagebox.showerror(
+                messagebox.showerror(
                     "Error",
                     "Maximum value must be greater than minimum value"
                 )
@@ -80,7 +80,7 @@ class ScaleSelector:
             self.finish(min_val, max_val)
             
         except ValueError:
-            tk.messagebox.showerror(
+            messagebox.showerror(
                 "Error",
                 "Please enter valid numbers"
             )
@@ -97,6 +97,7 @@ class ScaleSelector:
 
 class ColorSchemeSelector:
     def __init__(self):
+        import tkinter as tk
         self.root = tk.Tk()
         self.root.title("Select Color Scheme")
         self.selected_scheme = None
@@ -173,96 +174,160 @@ class ColorSchemeSelector:
         self.root.destroy()
         return self.selected_scheme
 
-def create_heatmap():
-    # Hide the main tkinter window
-    root = Tk()
-    root.withdraw()
+def parse_id_range(text):
+    """Parse a 1-based inclusive ID range like '1-500'."""
+    try:
+        first, last = (int(part) for part in text.split('-'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a range like 1-500, not {text!r}")
+    if not 1 <= first <= last:
+        raise argparse.ArgumentTypeError(f"invalid range {text!r}")
+    return first, last
 
-    # Prompt user to select input file
-    file_path = filedialog.askopenfilename(
-        title="Select Input Spreadsheet",
-        filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")]
-    )
+def create_heatmap(mirror=False, rows=None, cols=None, top=10, file_path=None, scale=None, color_scheme=None, output=None, block=None, mode="auto"):
+    """Build the rating matrix from a rated file and render it.
+
+    Any of the input file, scale and colour scheme that are not given are asked for
+    with dialogs. With `output` the figure is written to a PNG/SVG file instead of
+    being shown, so a fully specified call needs no display at all.
+    """
+    if file_path is None:
+        from tkinter import filedialog, Tk
+        
+        # Hide the main tkinter window
+        root = Tk()
+        root.withdraw()
+
+        # Prompt user to select input file
+        file_path = filedialog.askopenfilename(
+            title="Select Input Spreadsheet",
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")]
+        )
+        root.destroy()
     
     if not file_path:
         print("No file selected. Exiting...")
         return
 
-    # Read the file (handles both Excel and CSV)
-    if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-
-    # Extract source IDs and split into x,y coordinates
-    source_ids = df['Source IDs'].str.split(',', expand=True).astype(int)
-    max_x = source_ids[0].max()
-    max_y = source_ids[1].max()
-
-    # Identify rating columns by looking for "Rating" in the column name
-    rating_cols = [col for col in df.columns if 'Rating' in col]
-    
-    if not rating_cols:
-        print("No rating columns found. Please ensure column headers contain 'Rating'")
+    # Stream only the source ID and rating columns into a sparse store
+    try:
+        ratings = load_ratings(file_path)
+    except ValueError as e:
+        print(str(e))
         return
-
-    # Calculate average ratings using only the rating columns
-    avg_ratings = df[rating_cols].mean(axis=1)
     
     # Get scale range from user
-    scale_selector = ScaleSelector()
-    vmin, vmax = scale_selector.get_scale()
+    if scale is None:
+        scale_selector = ScaleSelector()
+        scale = scale_selector.get_scale()
+    vmin, vmax = scale
     
     if vmin is None or vmax is None:
         print("Operation cancelled. Exiting...")
         return
         
     # Get color scheme from user
-    color_selector = ColorSchemeSelector()
-    color_scheme = color_selector.get_scheme()
+    if color_scheme is None:
+        color_selector = ColorSchemeSelector()
+        color_scheme = color_selector.get_scheme()
     
     if color_scheme is None:
         print("Operation cancelled. Exiting...")
         return
 
-    # Create empty matrix filled with NaN
-    heatmap_matrix = np.full((max_x, max_y), np.nan)
-
-    # Fill matrix with average ratings
-    for idx, row in source_ids.iterrows():
-        x, y = row[0] - 1, row[1] - 1  # Subtract 1 for 0-based indexing
-        heatmap_matrix[x, y] = avg_ratings[idx]
-
-    # Create heatmap
-    plt.figure(figsize=(10, 8))
-    ax = plt.gca()
-    
-    # Determine whether to show annotations based on matrix size
-    show_annotations = max_x <= 10 and max_y <= 10
+    if mirror:
+        ratings = ratings.mirrored()
     
-    # Create heatmap with selected color scheme
-    sns.heatmap(heatmap_matrix, 
-                annot=heatmap_matrix if show_annotations else False,  # Pass the matrix itself for annotations
-                fmt='.2f',   # Format to 2 decimal places
-                cmap=color_scheme,  # Use selected color scheme
-                cbar_kws={'label': 'Average Rating'},
-                xticklabels=range(1, max_y + 1),
-                yticklabels=range(1, max_x + 1),
-                vmin=vmin,  # Set minimum value for color scale
-                vmax=vmax)  # Set maximum value for color scale
+    # Report the best pairs across the whole run, not just the rendered viewport
+    if top:
+        print(f"Top {top} rated pairs:")
+        for x, y, mean, count in zip(*ratings.top_pairs(top)):
+            print(f"  {x},{y}: {mean:.2f} ({count} ratings)")
 
-    # Move x-axis to top
-    ax.xaxis.set_ticks_position('top')
-    ax.xaxis.set_label_position('top')
-    
-    # Set labels with new descriptions
-    plt.xlabel('2nd Source ID')
-    plt.ylabel('1st Source ID')
-    plt.title('Average Ratings Heatmap', pad=20)  # Add padding to prevent overlap with label
+    # Only the viewport being rendered is converted to a dense matrix
+    render_heatmap(
+        ratings,
+        vmin,
+        vmax,
+        color_scheme,
+        rows=rows,
+        cols=cols,
+        block=block,
+        output=output,
+        mode=mode
+    )
+    if output:
+        print(f"Heatmap saved to: {output}")
 
-    # Show plot
-    plt.tight_layout()
-    plt.show()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Draw a heat map of average ratings per source pair.")
+    parser.add_argument(
+        "input",
+        nargs="?",
+        help="rated file (.xlsx, .csv or .parquet); asked for with a dialog if omitted"
+    )
+    parser.add_argument(
+        "--output",
+        help="write the heat map to this PNG/SVG file instead of showing a window"
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        nargs=2,
+        metavar=("MIN", "MAX"),
+        help="colour scale range; asked for with a dialog if omitted"
+    )
+    parser.add_argument(
+        "--cmap",
+        help="matplotlib colour map, e.g. RdYlBu_r or viridis; asked for with a dialog if omitted"
+    )
+    parser.add_argument(
+        "--render",
+        choices=["auto", "heatmap", "image"],
+        default="auto",
+        help="heatmap draws one patch per cell, image one rasterized bitmap; auto picks by size"
+    )
+    parser.add_argument(
+        "--block",
+        type=int,
+        help="average the matrix over BLOCK x BLOCK tiles (default: chosen to fit the image)"
+    )
+    parser.add_argument(
+        "--mirror",
+        action="store_true",
+        help="also show each rating at its mirrored cell, giving a symmetric matrix"
+    )
+    parser.add_argument(
+        "--rows",
+        type=parse_id_range,
+        help="only render 1st source IDs in this range, e.g. 1-500"
+    )
+    parser.add_argument(
+        "--cols",
+        type=parse_id_range,
+        help="only render 2nd source IDs in this range, e.g. 1-500"
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="print the N best-rated pairs (default: 10, 0 to disable)"
+    )
+    args = parser.parse_args(argv)
+    if args.scale and args.scale[0] >= args.scale[1]:
+        parser.error("Maximum value must be greater than minimum value")
+    create_heatmap(
+        mirror=args.mirror,
+        rows=args.rows,
+        cols=args.cols,
+        top=args.top,
+        file_path=args.input,
+        scale=tuple(args.scale) if args.scale else None,
+        color_scheme=args.cmap,
+        output=args.output,
+        block=args.block,
+        mode=args.render
+    )
 
 if __name__ == "__main__":
-    create_heatmap()
\ No newline at end of file
+    main()
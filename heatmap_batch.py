@@ -0,0 +1,207 @@
+"""
+Heatmap Batch - Render heat maps for many rated outputs at once
+
+Takes directories and/or glob patterns of rated output files, builds each rating
+matrix and renders its heat map in a process pool, so regenerating a full report set
+scales with the number of cores. All maps share one colour scale and colour map so
+they can be compared side by side. An index.html and index.csv with per-run summary
+statistics are written next to the images.
+
+Usage:
+    python heatmap_batch.py ratings/ "archive/*-rated.parquet" --scale 1 5 -o reports/
+"""
+
+import argparse
+import csv
+import glob
+import html
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from heatmap_render import render_heatmap
+from rating_matrix import load_ratings
+
+# File types picked up when a directory is given
+RATED_EXTENSIONS = (".csv", ".parquet", ".xlsx")
+
+# Columns of index.csv, in order
+INDEX_COLUMNS = [
+    "file", "image", "ratings", "rated_pairs", "prompts",
+    "mean", "std", "min", "max", "top_pair", "top_mean", "seconds", "error"
+]
+
+
+def find_rated_files(patterns):
+    """Expand directories and glob patterns into a sorted list of rated files."""
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for extension in RATED_EXTENSIONS:
+                files.update(glob.glob(os.path.join(pattern, f"*{extension}")))
+        else:
+            files.update(
+                path for path in glob.glob(pattern)
+                if os.path.splitext(path)[1].lower() in RATED_EXTENSIONS
+            )
+    return sorted(files)
+
+
+def image_names(files, image_format):
+    """Give every file a distinct image name, numbering repeated stems."""
+    names = []
+    seen = {}
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        suffix = f"-{seen[stem]}" if seen[stem] > 1 else ""
+        names.append(f"{stem}{suffix}.{image_format}")
+    return names
+
+
+def summarize(ratings):
+    """Summary statistics of a SparseRatingMatrix for the index."""
+    _, _, means, counts = ratings.cells()
+    total = int(counts.sum())
+    if not total:
+        return {"ratings": 0, "rated_pairs": 0, "prompts": max(ratings.shape)}
+    mean = ratings.sums.sum() / total
+    variance = max(ratings.squares.sum() / total - mean ** 2, 0.0)
+    top_x, top_y, top_means, _ = ratings.top_pairs(1)
+    return {
+        "ratings": total,
+        "rated_pairs": len(counts),
+        "prompts": max(ratings.shape),
+        "mean": round(float(mean), 3),
+        "std": round(float(variance ** 0.5), 3),
+        "min": round(float(means.min()), 3),
+        "max": round(float(means.max()), 3),
+        "top_pair": f"{top_x[0]},{top_y[0]}",
+        "top_mean": round(float(top_means[0]), 3)
+    }
+
+
+def render_run(file_path, image_path, vmin, vmax, color_scheme, mirror=False, block=None, mode="auto"):
+    """Build and render one run's heat map; returns its index row. Runs in a worker process."""
+    start = time.perf_counter()
+    row = {"file": file_path, "image": os.path.basename(image_path)}
+    try:
+        ratings = load_ratings(file_path)
+        if mirror:
+            ratings = ratings.mirrored()
+        row.update(summarize(ratings))
+        render_heatmap(
+            ratings,
+            vmin,
+            vmax,
+            color_scheme,
+            block=block,
+            output=image_path,
+            mode=mode,
+            title=os.path.basename(file_path)
+        )
+    except Exception as e:
+        row["image"] = ""
+        row["error"] = str(e)
+    row["seconds"] = round(time.perf_counter() - start, 2)
+    return row
+
+
+def write_index_csv(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=INDEX_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({column: row.get(column, "") for column in INDEX_COLUMNS})
+
+
+def write_index_html(rows, path, vmin, vmax, color_scheme):
+    """Write a page with one section per run: its summary table and heat map."""
+    stat_columns = [column for column in INDEX_COLUMNS if column not in ("file", "image")]
+    sections = []
+    for row in rows:
+        cells = "".join(
+            f"<tr><th>{column}</th><td>{html.escape(str(row.get(column, '')))}</td></tr>"
+            for column in stat_columns
+            if row.get(column, "") != ""
+        )
+        image = f'<img src="{html.escape(row["image"])}" loading="lazy">' if row["image"] else ""
+        sections.append(
+            f"<section><h2>{html.escape(row['file'])}</h2>"
+            f"<table>{cells}</table>{image}</section>"
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Rating heat maps</title>"
+            "<style>body{font-family:sans-serif}section{margin-bottom:2em}"
+            "th{text-align:left;padding-right:1em}img{max-width:100%}</style></head><body>\n"
+            f"<h1>Rating heat maps</h1><p>{len(rows)} runs, scale {vmin:g}-{vmax:g}, "
+            f"colour map {html.escape(color_scheme)}</p>\n"
+            + "\n".join(sections)
+            + "\n</body></html>\n"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render heat maps for many rated outputs in parallel.")
+    parser.add_argument("inputs", nargs="+", help="directories or glob patterns of rated files (.csv, .parquet, .xlsx)")
+    parser.add_argument("-o", "--output-dir", default="heatmaps", help="where images and the index are written (default: heatmaps)")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        nargs=2,
+        metavar=("MIN", "MAX"),
+        required=True,
+        help="colour scale range shared by all heat maps"
+    )
+    parser.add_argument("--cmap", default="RdYlBu_r", help="matplotlib colour map shared by all heat maps (default: RdYlBu_r)")
+    parser.add_argument("--format", choices=["png", "svg"], default="png", help="image format (default: png)")
+    parser.add_argument("--mirror", action="store_true", help="show each rating at its mirrored cell as well")
+    parser.add_argument("--block", type=int, help="average over BLOCK x BLOCK tiles (default: chosen to fit the image)")
+    parser.add_argument("--render", choices=["auto", "heatmap", "image"], default="auto", help="drawing style, as in heat-map-recombined.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    vmin, vmax = args.scale
+    if vmin >= vmax:
+        parser.error("Maximum value must be greater than minimum value")
+
+    files = find_rated_files(args.inputs)
+    if not files:
+        print("No rated files found. Exiting...")
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    images = [os.path.join(args.output_dir, name) for name in image_names(files, args.format)]
+
+    print(f"Rendering {len(files)} heat maps with {args.workers} workers...")
+    start = time.perf_counter()
+    rows = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(
+                render_run, file_path, image_path, vmin, vmax, args.cmap,
+                args.mirror, args.block, args.render
+            ): file_path
+            for file_path, image_path in zip(files, images)
+        }
+        for future in as_completed(futures):
+            row = future.result()
+            rows[futures[future]] = row
+            status = f"error: {row['error']}" if row.get("error") else f"{row['seconds']}s"
+            print(f"  {row['file']} ({status})")
+
+    # Index in input order, whatever order the workers finished in
+    ordered = [rows[file_path] for file_path in files]
+    write_index_csv(ordered, os.path.join(args.output_dir, "index.csv"))
+    write_index_html(ordered, os.path.join(args.output_dir, "index.html"), vmin, vmax, args.cmap)
+
+    failed = sum(1 for row in ordered if row.get("error"))
+    print(f"Rendered {len(files) - failed} of {len(files)} heat maps in {time.perf_counter() - start:.1f}s")
+    print(f"Index written to: {os.path.join(args.output_dir, 'index.html')}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Heatmap Render - Drawing rating matrices for heat-map-recombined.py
+
+Small matrices are drawn cell by cell with seaborn, as before. Large ones are drawn as
+a single rasterized image, aggregated into k x k blocks when they have more cells than
+the image has pixels to show. With an output file the figure is written with the Agg
+backend and no window is opened, so rendering works on headless machines.
+"""
+
+import math
+
+import numpy as np
+
+# Matrices up to this many cells per side are drawn with one seaborn patch per cell
+MAX_SEABORN_SIDE = 100
+
+# Larger matrices are aggregated so the image has at most this many tiles per side
+MAX_RENDERED_SIDE = 1000
+
+# Cell values are written into the cells up to this many cells per side
+MAX_ANNOTATED_SIDE = 10
+
+
+def choose_block_size(rows, cols, max_side=MAX_RENDERED_SIDE):
+    """Smallest block size that keeps a viewport within max_side tiles per side."""
+    side = max(rows[1] - rows[0] + 1, cols[1] - cols[0] + 1)
+    return max(1, math.ceil(side / max_side))
+
+
+def render_heatmap(ratings, vmin, vmax, color_scheme, rows=None, cols=None, block=None, output=None, mode="auto", title="Average Ratings Heatmap"):
+    """Draw a SparseRatingMatrix viewport and show it, or save it to `output`.
+
+    `mode` is "heatmap" (seaborn, one patch per cell), "image" (rasterized imshow) or
+    "auto", which uses seaborn only for small, unaggregated matrices. `block` defaults
+    to the smallest aggregation that keeps the image within MAX_RENDERED_SIDE tiles.
+    """
+    import matplotlib.pyplot as plt
+
+    if output:
+        # Write the file directly without opening a window
+        plt.switch_backend("Agg")
+
+    rows = rows or (1, ratings.shape[0])
+    cols = cols or (1, ratings.shape[1])
+    block = block or choose_block_size(rows, cols)
+    if block > 1:
+        matrix = ratings.to_blocks(block, rows, cols)
+    else:
+        matrix = ratings.to_dense(rows, cols)
+    max_x, max_y = matrix.shape
+
+    fig = plt.figure(figsize=(10, 8))
+    ax = plt.gca()
+
+    use_seaborn = mode == "heatmap" or (mode == "auto" and block == 1 and max(max_x, max_y) <= MAX_SEABORN_SIDE)
+    if use_seaborn:
+        import seaborn as sns
+
+        # Determine whether to show annotations based on matrix size
+        show_annotations = max_x <= MAX_ANNOTATED_SIDE and max_y <= MAX_ANNOTATED_SIDE
+        sns.heatmap(matrix,
+                    annot=matrix if show_annotations else False,
+                    fmt='.2f',
+                    cmap=color_scheme,
+                    cbar_kws={'label': 'Average Rating'},
+                    xticklabels=range(cols[0], cols[1] + 1, block),
+                    yticklabels=range(rows[0], rows[1] + 1, block),
+                    vmin=vmin,
+                    vmax=vmax)
+    else:
+        # One rasterized image instead of one patch per cell, in source ID coordinates
+        extent = (
+            cols[0] - 0.5,
+            cols[0] - 0.5 + max_y * block,
+            rows[0] - 0.5 + max_x * block,
+            rows[0] - 0.5
+        )
+        image = ax.imshow(
+            np.ma.masked_invalid(matrix),
+            cmap=color_scheme,
+            vmin=vmin,
+            vmax=vmax,
+            interpolation="nearest",
+            aspect="auto",
+            extent=extent,
+            rasterized=True
+        )
+        label = 'Average Rating'
+        if block > 1:
+            label += f' (mean per {block}x{block} block)'
+        fig.colorbar(image, ax=ax, label=label)
+
+    # Move x-axis to top
+    ax.xaxis.set_ticks_position('top')
+    ax.xaxis.set_label_position('top')
+
+    plt.xlabel('2nd Source ID')
+    plt.ylabel('1st Source ID')
+    plt.title(title, pad=20)  # Add padding to prevent overlap with label
+
+    plt.tight_layout()
+    if output:
+        fig.savefig(output, dpi=150)
+        plt.close(fig)
+    else:
+        plt.show()
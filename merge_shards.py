@@ -0,0 +1,268 @@
+"""
+Merge Shards - Combine sharded recombine.py outputs into one ordered file
+
+A large pair matrix can be split across machines with `recombine.py --shard i/k`. Each
+shard writes its output together with a `<output>.shard.json` provenance file. This
+script checks that the shards belong to the same run and cover every pair exactly once,
+then concatenates them into the final output in pair order. Shards are contiguous rank
+ranges, so they are streamed one after the other, chunk by chunk, and only one chunk
+of rows is in memory at a time however large the run.
+
+Usage:
+    python merge_shards.py shard-1.xlsx shard-2.xlsx ... -o merged.xlsx
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from output_sinks import COLUMNS, open_sink
+from pairs import PairPlan
+
+# Rows read from a shard output at a time, when checking and merging
+MERGE_CHUNK_ROWS = 100_000
+
+# Fields that must be identical across all shards of one run
+RUN_FIELDS = [
+    "run_key", "model", "order", "shards", "total_pairs", "prompt_ids", "prompts_sha256",
+    "post_processors", "similarity_threshold", "pruned_pairs", "condense_max_chars"
+]
+
+
+def shard_metadata_path(output_file):
+    """Return the provenance file written next to a shard's output."""
+    return f"{output_file}.shard.json"
+
+
+def prompts_digest(items):
+    """Hash the selected (row_id, prompt) items so shards can check they used the same input."""
+    return hashlib.sha256(json.dumps(items).encode("utf-8")).hexdigest()
+
+
+def write_shard_metadata(output_file, plan, shard, shards, run_key, model, input_file, rows, filtered=0, post_processors=None, similarity_threshold=None, pruned_pairs=(), condense_max_chars=None):
+    """Record which part of which run a shard output contains.
+
+    `filtered` is the number of pairs whose text was dropped by post-processing, and
+    `pruned_pairs` the (row_id1, row_id2) pairs left out as too similar; both are
+    legitimately missing from the output.
+    """
+    metadata = {
+        "shard": shard,
+        "shards": shards,
+        "start": plan.start,
+        "stop": plan.stop,
+        "total_pairs": plan.total,
+        "rows": rows,
+        "filtered": filtered,
+        "post_processors": post_processors or [],
+        "similarity_threshold": similarity_threshold,
+        "pruned_pairs": sorted({(min(pair), max(pair)) for pair in pruned_pairs}),
+        "condense_max_chars": condense_max_chars,
+        "order": plan.order,
+        "prompt_ids": plan.ids,
+        "prompts_sha256": prompts_digest(plan.items),
+        "run_key": run_key,
+        "model": model,
+        "input_file": input_file,
+        "created": datetime.now(timezone.utc).isoformat()
+    }
+    with open(shard_metadata_path(output_file), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def _excel_chunks(path, chunk_rows):
+    from openpyxl import load_workbook
+
+    # A read-only workbook streams its rows instead of loading the whole sheet
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        columns = list(next(rows, COLUMNS))
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _parquet_chunks(path, chunk_rows):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        df = batch.to_pandas()
+        df.insert(1, "Source IDs", df["source_id_1"].astype(str) + "," + df["source_id_2"].astype(str))
+        yield df.drop(columns=["source_id_1", "source_id_2"])
+
+
+def read_output_chunks(path, chunk_rows=MERGE_CHUNK_ROWS):
+    """Yield a recombine.py output file in any of the supported formats as dataframes of `chunk_rows` rows."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return pd.read_csv(path, chunksize=chunk_rows)
+    if extension == ".jsonl":
+        return pd.read_json(path, lines=True, chunksize=chunk_rows)
+    if extension == ".parquet":
+        return _parquet_chunks(path, chunk_rows)
+    return _excel_chunks(path, chunk_rows)
+
+
+def load_shards(shard_files):
+    """Load (metadata, output path) for each shard output; the rows are only read when needed."""
+    shards = []
+    for shard_file in shard_files:
+        with open(shard_metadata_path(shard_file), encoding="utf-8") as f:
+            metadata = json.load(f)
+        if not os.path.exists(shard_file):
+            raise FileNotFoundError(f"Shard output {shard_file} not found")
+        shards.append((metadata, shard_file))
+    return shards
+
+
+def validate_shards(shards):
+    """Check the shards form one complete run; returns a list of problems (empty if none)."""
+    problems = []
+    if not shards:
+        return ["No shards given"]
+
+    first = shards[0][0]
+    for metadata, _ in shards[1:]:
+        for field in RUN_FIELDS:
+            # Older shards lack the optional fields; treat missing and empty alike
+            if (metadata.get(field) or None) != (first.get(field) or None):
+                problems.append(f"Shard {metadata['shard']} has a different {field} than shard {first['shard']}")
+    if problems:
+        return problems
+
+    # Every shard index exactly once, and the rank ranges tile [0, total_pairs)
+    indices = sorted(metadata["shard"] for metadata, _ in shards)
+    expected_indices = list(range(1, first["shards"] + 1))
+    if indices != expected_indices:
+        missing = sorted(set(expected_indices) - set(indices))
+        duplicated = sorted({index for index in indices if indices.count(index) > 1})
+        if missing:
+            problems.append(f"Missing shards: {missing}")
+        if duplicated:
+            problems.append(f"Duplicated shards: {duplicated}")
+        return problems
+
+    position = 0
+    for metadata, _ in sorted(shards, key=lambda shard: shard[0]["start"]):
+        if metadata["start"] != position:
+            problems.append(f"Shard {metadata['shard']} starts at pair {metadata['start'] + 1}, expected {position + 1}")
+        position = metadata["stop"]
+    if position != first["total_pairs"]:
+        problems.append(f"Shards end at pair {position}, expected {first['total_pairs']}")
+    if problems:
+        return problems
+
+    # Each row must be the expected pair for its rank, with no pair missing or repeated
+    items = [(row_id, None) for row_id in first["prompt_ids"]]
+    pruned_pairs = {tuple(pair) for pair in first.get("pruned_pairs") or []}
+    skip = (lambda pair: (min(pair[2], pair[3]), max(pair[2], pair[3])) in pruned_pairs) if pruned_pairs else None
+    plan = PairPlan(items, order=first["order"], skip=skip)
+    for metadata, path in shards:
+        problems.extend(_check_shard_rows(metadata, plan.shard(metadata["shard"], metadata["shards"]), path))
+    return problems
+
+
+def _check_shard_rows(metadata, shard_plan, path):
+    """Compare a shard's rows, streamed in file order, with the pairs its plan expects.
+
+    Rows are written in rank order, so the expected pairs are walked alongside them
+    and neither side has to be held in memory.
+    """
+    shard = metadata["shard"]
+    expected = shard_plan.ranked()
+    upcoming = next(expected, None)
+    missing = 0
+    first_missing = None
+    duplicates = 0
+    last = 0
+    for chunk in read_output_chunks(path):
+        for number, source_ids in zip(chunk["#"].tolist(), chunk["Source IDs"].astype(str)):
+            if number <= last:
+                duplicates += 1
+                continue
+            last = number
+            while upcoming is not None and upcoming[0] + 1 < number:
+                missing += 1
+                first_missing = first_missing or upcoming[0] + 1
+                upcoming = next(expected, None)
+            if upcoming is None or upcoming[0] + 1 != number:
+                return [f"Shard {shard} contains pair #{number}, which is not one of its pairs"]
+            _, (_, _, prompt_id1, prompt_id2) = upcoming
+            if source_ids != f"{prompt_id1},{prompt_id2}":
+                return [f"Shard {shard} row #{number} has Source IDs {source_ids}, expected {prompt_id1},{prompt_id2}"]
+            upcoming = next(expected, None)
+    while upcoming is not None:
+        missing += 1
+        first_missing = first_missing or upcoming[0] + 1
+        upcoming = next(expected, None)
+
+    problems = []
+    if duplicates:
+        problems.append(f"Shard {shard} contains {duplicates} duplicated or out-of-order pairs")
+    # Pairs dropped by post-processing filters are expected to be missing
+    filtered = metadata.get("filtered", 0)
+    if missing > filtered:
+        problems.append(f"Shard {shard} is missing {missing - filtered} pairs beyond the {filtered} filtered out, e.g. #{first_missing}")
+    return problems
+
+
+def merged_metadata(shards):
+    """Return the run metadata of the merged output, taken from its validated shards."""
+    first = shards[0][0]
+    metadata = {field: first.get(field) for field in RUN_FIELDS}
+    metadata["input_file"] = first.get("input_file")
+    metadata["filtered"] = sum(shard_metadata.get("filtered", 0) for shard_metadata, _ in shards)
+    metadata["created"] = datetime.now(timezone.utc).isoformat()
+    return metadata
+
+
+def merge_shards(shards, sink):
+    """Write validated shards to `sink` in pair order, a chunk at a time; returns the rows written."""
+    for _, path in sorted(shards, key=lambda shard: shard[0]["start"]):
+        for chunk in read_output_chunks(path):
+            for number, source_ids, prompt in zip(chunk["#"].tolist(), chunk["Source IDs"].astype(str), chunk["Prompt"]):
+                sink.write({"#": int(number), "Source IDs": source_ids, "Prompt": prompt})
+    return sink.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge sharded recombine.py outputs.")
+    parser.add_argument("shard_files", nargs="+", help="shard output files written with --shard")
+    parser.add_argument("-o", "--output", required=True, help="merged file to write (.xlsx, .csv, .jsonl or .parquet)")
+    args = parser.parse_args(argv)
+
+    try:
+        shards = load_shards(args.shard_files)
+        problems = validate_shards(shards)
+    except Exception as e:
+        print(f"Error reading shards: {str(e)}")
+        sys.exit(1)
+
+    if problems:
+        print("Cannot merge shards:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+
+    metadata = merged_metadata(shards)
+    with open_sink(args.output, metadata) as sink:
+        rows = merge_shards(shards, sink)
+
+    print(f"Merged {len(shards)} shards ({rows} pairs, {metadata['filtered']} filtered out) into: {args.output}")
+
+if __name__ == "__main__":
+    main()
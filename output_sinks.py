@@ -0,0 +1,198 @@
+"""
+Output Sinks - Incremental writers for recombine.py results
+
+Rows are written one at a time as they complete instead of being collected into a
+DataFrame and written at the end, so memory stays flat however large the run is.
+The sink is chosen from the output file's extension:
+
+- .xlsx  openpyxl write-only workbook, with the usual column widths
+- .csv   plain CSV, flushed as it goes so results are visible during the run
+- .jsonl one JSON object per line, also flushed as it goes
+- .parquet  columnar Arrow/Parquet with integer source_id_1/source_id_2 columns,
+            zstd-compressed text and a run-metadata footer (needs pyarrow)
+"""
+
+import csv
+import json
+import os
+import time
+
+COLUMNS = ["#", "Source IDs", "Prompt"]
+
+# Column widths used for Excel output
+COLUMN_WIDTHS = {
+    "A": 5,   # #
+    "B": 15,  # Source IDs
+    "C": 50,  # Prompt
+}
+
+# How often text sinks push buffered rows to disk
+FLUSH_EVERY_SECONDS = 2.0
+
+# Rows per Parquet row group; each group is buffered in memory before it is written
+PARQUET_ROW_GROUP_SIZE = 2000
+
+# Key under which run metadata is stored in the Parquet schema
+PARQUET_METADATA_KEY = b"recombine"
+
+
+class OutputSink:
+    """Base class for sinks; rows are dicts keyed by COLUMNS."""
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = metadata
+        self.rows = 0
+
+    def write(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class XlsxSink(OutputSink):
+    """Streams rows into a write-only openpyxl workbook.
+
+    Write-only worksheets keep only the current row in memory. The workbook itself is
+    only complete once it is saved on close.
+    """
+
+    def __init__(self, path, metadata=None):
+        super().__init__(path, metadata)
+        from openpyxl import Workbook
+
+        self.workbook = Workbook(write_only=True)
+        self.worksheet = self.workbook.create_sheet("Sheet1")
+        for column, width in COLUMN_WIDTHS.items():
+            self.worksheet.column_dimensions[column].width = width
+        self.worksheet.append(COLUMNS)
+
+    def write(self, row):
+        self.worksheet.append([row[column] for column in COLUMNS])
+        self.rows += 1
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.save(self.path)
+            self.workbook = None
+
+
+class _TextSink(OutputSink):
+    """Shared flushing for line-oriented sinks."""
+
+    def __init__(self, path, metadata=None, newline=None):
+        super().__init__(path, metadata)
+        self.file = open(path, "w", encoding="utf-8", newline=newline)
+        self.last_flush = time.monotonic()
+
+    def _written(self):
+        self.rows += 1
+        now = time.monotonic()
+        if now - self.last_flush >= FLUSH_EVERY_SECONDS:
+            self.file.flush()
+            self.last_flush = now
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class CsvSink(_TextSink):
+    def __init__(self, path, metadata=None):
+        super().__init__(path, metadata, newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, row):
+        self.writer.writerow([row[column] for column in COLUMNS])
+        self._written()
+
+
+class JsonlSink(_TextSink):
+    def write(self, row):
+        self.file.write(json.dumps({column: row[column] for column in COLUMNS}) + "\n")
+        self._written()
+
+
+class ParquetSink(OutputSink):
+    """Writes rows to Parquet in row groups, with source IDs as two integer columns.
+
+    `metadata` (e.g. goal, context hash, model, timestamp) is stored as JSON in the
+    file's schema metadata, where read_run_metadata() can find it.
+    """
+
+    def __init__(self, path, metadata=None):
+        super().__init__(path, metadata)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        schema = pa.schema([
+            ("#", pa.int64()),
+            ("source_id_1", pa.int64()),
+            ("source_id_2", pa.int64()),
+            ("Prompt", pa.string()),
+        ])
+        if metadata:
+            schema = schema.with_metadata({PARQUET_METADATA_KEY: json.dumps(metadata).encode("utf-8")})
+        self.schema = schema
+        self.writer = pq.ParquetWriter(path, schema, compression="zstd")
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self.buffer = {name: [] for name in self.schema.names}
+
+    def _flush(self):
+        if self.buffer["#"]:
+            self.writer.write_table(self.pa.Table.from_pydict(self.buffer, schema=self.schema))
+            self._reset_buffer()
+
+    def write(self, row):
+        source_id_1, source_id_2 = str(row["Source IDs"]).split(",")
+        self.buffer["#"].append(int(row["#"]))
+        self.buffer["source_id_1"].append(int(source_id_1))
+        self.buffer["source_id_2"].append(int(source_id_2))
+        self.buffer["Prompt"].append(row["Prompt"])
+        self.rows += 1
+        if len(self.buffer["#"]) >= PARQUET_ROW_GROUP_SIZE:
+            self._flush()
+
+    def close(self):
+        if self.writer is not None:
+            self._flush()
+            self.writer.close()
+            self.writer = None
+
+
+def read_run_metadata(path):
+    """Return the run metadata stored in a Parquet output, or None."""
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(path).metadata or {}
+    if PARQUET_METADATA_KEY not in metadata:
+        return None
+    return json.loads(metadata[PARQUET_METADATA_KEY])
+
+
+SINKS = {
+    ".xlsx": XlsxSink,
+    ".csv": CsvSink,
+    ".jsonl": JsonlSink,
+    ".parquet": ParquetSink,
+}
+
+
+def open_sink(path, metadata=None):
+    """Open the sink matching the output file's extension (Excel by default).
+
+    `metadata` describes the run; formats that can store it (Parquet) do.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    return SINKS.get(extension, XlsxSink)(path, metadata)
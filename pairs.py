@@ -0,0 +1,145 @@
+"""
+Pairs - Lazy enumeration of the prompt pair matrix for recombine.py
+
+The selected prompts are carried together with their original row IDs from selection
+time, so no ID ever has to be looked up by prompt text (which was O(N) per lookup and
+mapped duplicate texts to the first occurrence). Pairs are yielded lazily in one of a
+few deterministic orders, and counts are computed without materializing the pairs.
+"""
+
+import random
+
+# Deterministic pair orders:
+#   row      - (1,2), (1,3), ... (1,N), (2,3), ...  groups pairs by first prompt
+#   column   - (1,2), (1,3), (2,3), (1,4), ...       grows the matrix one prompt at a time
+#   diagonal - (1,2), (2,3), ... (1,3), (2,4), ...   every prompt appears early in the run
+PAIR_ORDERS = ("row", "column", "diagonal")
+
+
+def pair_count(n):
+    """Number of i<j pairs among n prompts."""
+    return n * (n - 1) // 2
+
+
+def _pair_groups(n, order):
+    """Yield (size, pair_at) for each run of pairs in `order`, where pair_at(k) is the kth pair."""
+    if order == "row":
+        for i in range(n):
+            yield n - 1 - i, lambda k, i=i: (i, i + 1 + k)
+    elif order == "column":
+        for j in range(1, n):
+            yield j, lambda k, j=j: (k, j)
+    elif order == "diagonal":
+        for distance in range(1, n):
+            yield n - distance, lambda k, distance=distance: (k, k + distance)
+    else:
+        raise ValueError(f"Unknown pair order: {order}")
+
+
+def iter_index_pairs(n, order="row", start=0, stop=None):
+    """Yield the (i, j) positions, i < j, of the pairs ranked start..stop-1 in `order`.
+
+    Whole groups before `start` are skipped arithmetically, so starting deep into a
+    large matrix costs O(n) rather than O(n²).
+    """
+    stop = pair_count(n) if stop is None else stop
+    rank = 0
+    for size, pair_at in _pair_groups(n, order):
+        if rank >= stop:
+            return
+        if rank + size <= start:
+            rank += size
+            continue
+        for k in range(max(0, start - rank), min(size, stop - rank)):
+            yield pair_at(k)
+        rank += size
+
+
+def shard_range(total, shard, shards):
+    """Return the [start, stop) ranks of 1-based `shard` out of `shards` balanced contiguous shards."""
+    if not 1 <= shard <= shards:
+        raise ValueError(f"Shard {shard} is not between 1 and {shards}")
+    return total * (shard - 1) // shards, total * shard // shards
+
+
+def parse_shard(spec):
+    """Parse a shard spec like '2/4' into (2, 4)."""
+    try:
+        shard, shards = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/k, e.g. 2/4, not {spec!r}")
+    shard_range(0, shard, shards)
+    return shard, shards
+
+
+def select_all(prompts):
+    """Select every prompt, returning (row_id, prompt) items with 1-based row IDs."""
+    return [(row_id, prompt) for row_id, prompt in enumerate(prompts, 1)]
+
+
+def select_random(prompts, k, rng=random):
+    """Select k prompts at random, keeping their row IDs."""
+    return [(index + 1, prompts[index]) for index in rng.sample(range(len(prompts)), k)]
+
+
+def select_ids(prompts, row_ids):
+    """Select the prompts with the given 1-based row IDs, in the order given."""
+    return [(row_id, prompts[row_id - 1]) for row_id in row_ids]
+
+
+class PairPlan:
+    """The pairs to generate from a list of (row_id, prompt) items.
+
+    Iterating yields (prompt1, prompt2, prompt_id1, prompt_id2) tuples lazily, in the
+    same order every time, so a plan can be walked more than once (e.g. to schedule
+    requests and later to merge results). `start` and `stop` restrict the plan to a
+    contiguous range of pair ranks, and `skip` optionally excludes pairs, for instance
+    ones already completed in an earlier run.
+    """
+
+    def __init__(self, items, order="row", skip=None, start=0, stop=None):
+        if order not in PAIR_ORDERS:
+            raise ValueError(f"Unknown pair order: {order}")
+        self.items = list(items)
+        self.order = order
+        self.skip = skip
+        self.total = pair_count(len(self.items))
+        self.start = start
+        self.stop = self.total if stop is None else stop
+
+    @property
+    def ids(self):
+        return [row_id for row_id, _ in self.items]
+
+    def __len__(self):
+        """Number of pairs in the plan's rank range, before any are skipped."""
+        return self.stop - self.start
+
+    def ranked(self):
+        """Yield (rank, pair) for every pair, where rank is its position in the full matrix."""
+        items = self.items
+        index_pairs = iter_index_pairs(len(items), self.order, self.start, self.stop)
+        for rank, (i, j) in enumerate(index_pairs, self.start):
+            prompt_id1, prompt1 = items[i]
+            prompt_id2, prompt2 = items[j]
+            pair = (prompt1, prompt2, prompt_id1, prompt_id2)
+            if self.skip is None or not self.skip(pair):
+                yield rank, pair
+
+    def __iter__(self):
+        for _, pair in self.ranked():
+            yield pair
+
+    def without(self, skip):
+        """Return a plan over the same pairs that also leaves out those `skip` matches."""
+        if self.skip is None:
+            combined = skip
+        else:
+            previous = self.skip
+            combined = lambda pair: previous(pair) or skip(pair)
+        return PairPlan(self.items, self.order, combined, self.start, self.stop)
+
+    def shard(self, shard, shards):
+        """Return the plan for 1-based `shard` of `shards` balanced contiguous rank ranges."""
+        start, stop = shard_range(self.total, shard, shards)
+        return PairPlan(self.items, self.order, self.skip, start, stop)
@@ -0,0 +1,164 @@
+"""
+Post Processors - Inline clean-up of generated text for recombine.py
+
+Each completion can be passed through an ordered list of post-processors before it is
+written, so the output file is final as soon as it is written and does not need a
+second pass with clean_prefixes.py. A post-processor takes the text and returns the
+new text, or None to drop the row. They are named on the command line:
+
+- strip-prefixes[=FILE]  remove labels like "Problem Statement:" (clean_prefixes.py list,
+                         or the prefixes in FILE)
+- normalize-whitespace   collapse runs of spaces, trim lines, at most one blank line
+- min-chars=N / max-chars=N  drop texts shorter / longer than N characters
+- min-words=N / max-words=N  drop texts with fewer / more than N words
+
+BackgroundWriter runs post-processing and writing on a thread of its own, so it
+overlaps with the requests still in flight.
+"""
+
+import asyncio
+import queue
+import re
+import threading
+
+# Completed rows that may wait for the writer thread before generation is held up
+MAX_PENDING_ROWS = 1024
+
+
+def strip_prefixes(path=None):
+    # clean_prefixes needs pandas, so it is only imported when this step is used
+    from clean_prefixes import PREFIX_PATTERN, clean_text, compile_prefix_pattern, load_prefixes
+
+    pattern = compile_prefix_pattern(load_prefixes(path)) if path else PREFIX_PATTERN
+    return lambda text: clean_text(text, pattern)
+
+
+def normalize_whitespace():
+    def normalize(text):
+        text = re.sub(r"[ \t]+", " ", text)
+        text = re.sub(r" ?\n ?", "\n", text)
+        return re.sub(r"\n{3,}", "\n\n", text).strip()
+    return normalize
+
+
+def _count(argument):
+    try:
+        return int(argument)
+    except (TypeError, ValueError):
+        raise ValueError(f"Expected a number, not {argument!r}")
+
+
+def min_chars(argument):
+    limit = _count(argument)
+    return lambda text: text if len(text) >= limit else None
+
+
+def max_chars(argument):
+    limit = _count(argument)
+    return lambda text: text if len(text) <= limit else None
+
+
+def min_words(argument):
+    limit = _count(argument)
+    return lambda text: text if len(text.split()) >= limit else None
+
+
+def max_words(argument):
+    limit = _count(argument)
+    return lambda text: text if len(text.split()) <= limit else None
+
+
+POST_PROCESSORS = {
+    "strip-prefixes": strip_prefixes,
+    "normalize-whitespace": normalize_whitespace,
+    "min-chars": min_chars,
+    "max-chars": max_chars,
+    "min-words": min_words,
+    "max-words": max_words,
+}
+
+
+def parse_post_processor(spec):
+    """Build the post-processor for a spec like 'strip-prefixes' or 'min-chars=40'."""
+    name, _, argument = spec.partition("=")
+    if name not in POST_PROCESSORS:
+        raise ValueError(f"Unknown post-processor {name!r}; choose from {', '.join(POST_PROCESSORS)}")
+    return POST_PROCESSORS[name](argument) if argument else POST_PROCESSORS[name]()
+
+
+class PostProcessingPipeline:
+    """An ordered list of post-processors, counting the texts they drop."""
+
+    def __init__(self, specs=()):
+        self.specs = list(specs)
+        self.steps = [parse_post_processor(spec) for spec in self.specs]
+        self.filtered = 0
+
+    def __call__(self, text):
+        """Return the processed text, or None if a filter dropped it."""
+        if not isinstance(text, str):
+            return text
+        for step in self.steps:
+            text = step(text)
+            if text is None:
+                self.filtered += 1
+                return None
+        return text
+
+
+class BackgroundWriter:
+    """Calls `write(*args)` for every submitted item, in order, on a separate thread.
+
+    Submitting waits only when MAX_PENDING_ROWS items are waiting. From an event loop it
+    never blocks the loop: it then returns an awaitable that completes once there is
+    room, and the caller awaits it. An exception in `write` stops further writes and
+    is raised again by the next submit or by close.
+    """
+
+    def __init__(self, write, max_pending=MAX_PENDING_ROWS):
+        self.write = write
+        self.queue = queue.Queue(max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                try:
+                    self.write(*item)
+                except Exception as e:
+                    self.error = e
+
+    def submit(self, *args):
+        if self.error is not None:
+            raise self.error
+        try:
+            self.queue.put_nowait(args)
+            return None
+        except queue.Full:
+            pass
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.queue.put(args)
+            return None
+        # Wait for room on another thread, so requests in flight keep being handled
+        return loop.run_in_executor(None, self.queue.put, args)
+
+    def close(self):
+        """Wait until everything submitted has been written."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,210 @@
+"""
+Progress - Non-blocking progress display for recombine.py
+
+Generation runs on a worker thread and reports each finished pair by putting the new
+count on a queue, which is all the progress reporting costs the workers. The display
+drains the queue on a timer in the main thread, keeps only the latest count, and
+shows throughput, ETA, failed pairs and requests in flight (read from the run
+metrics), so it stays responsive while requests are out and is never touched from
+another thread.
+
+A Tk window is used when a display is available, and a tqdm bar on the terminal
+otherwise or when asked for. Closing the window or pressing Ctrl+C stops the run once the pairs in
+flight have finished, and the output file is closed properly.
+"""
+
+import queue
+import threading
+import time
+
+from tqdm import tqdm
+
+try:
+    import tkinter as tk
+    from tkinter.ttk import Progressbar
+except ImportError:  # Python built without Tk, as on many servers
+    tk = None
+
+# How often the display is refreshed
+REFRESH_SECONDS = 0.25
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class Progress:
+    """Runs work on a worker thread while showing its progress; see TkProgress and TerminalProgress."""
+
+    def __init__(self, total, metrics=None):
+        self.total = total
+        self.metrics = metrics
+        self.events = queue.SimpleQueue()
+        self.current = 0
+        self.started = time.monotonic()
+        self.stop_requested = False
+
+    def update(self, completed):
+        """Report the number of finished pairs; safe to call from any thread."""
+        self.events.put(completed)
+
+    def stop(self):
+        """Ask the work to stop; it checks stop_requested before starting another pair."""
+        self.stop_requested = True
+
+    def run(self, work):
+        """Call work() on a worker thread and show progress until it is done.
+
+        Returns what work() returned, or raises what it raised.
+        """
+        outcome = {}
+        # An Event rather than Thread.join(), which an interrupt can leave in a broken state
+        done = threading.Event()
+
+        def target():
+            try:
+                outcome["result"] = work()
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=target, daemon=True).start()
+        try:
+            self.show_until_done(done)
+        except KeyboardInterrupt:
+            # Let the work unwind so the journal and output file are closed properly
+            self.stop()
+            print("\nStopping after the requests in flight...")
+            done.wait()
+        finally:
+            self.close()
+
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("result")
+
+    def drain(self):
+        """Apply the queued updates, keeping only the latest count."""
+        try:
+            while True:
+                self.current = self.events.get_nowait()
+        except queue.Empty:
+            pass
+
+    def stats(self):
+        """Return (pairs per second, seconds left or None, failed pairs, requests in flight)."""
+        elapsed = time.monotonic() - self.started
+        rate = self.current / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.current) / rate if rate > 0 else None
+        failed = self.metrics.pairs["failed"] if self.metrics else 0
+        in_flight = self.metrics.in_flight if self.metrics else 0
+        return rate, eta, failed, in_flight
+
+    def show_until_done(self, done):
+        """Refresh the display until the `done` event is set."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TkProgress(Progress):
+    """Progress bar window, refreshed from the Tk event loop."""
+
+    def __init__(self, total, metrics=None):
+        super().__init__(total, metrics)
+        self.root = tk.Tk()
+        self.root.title("Generation Progress")
+
+        # Window size and position
+        window_width = 400
+        window_height = 170
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        x = (screen_width - window_width) // 2
+        y = (screen_height - window_height) // 2
+        self.root.geometry(f"{window_width}x{window_height}+{x}+{y}")
+
+        # Progress bar
+        self.progress = Progressbar(self.root, length=300, mode='determinate')
+        self.progress.pack(pady=20)
+
+        # Progress label
+        self.label = tk.Label(self.root, text=f"0 / {total} items generated")
+        self.label.pack(pady=5)
+
+        # Throughput, ETA, errors and requests in flight
+        self.details = tk.Label(self.root, text="")
+        self.details.pack(pady=5)
+
+        # Closing the window stops the run instead of leaving it without a display
+        self.root.protocol("WM_DELETE_WINDOW", self.stop)
+
+    def show_until_done(self, done):
+        def refresh():
+            self.drain()
+            self.render()
+            if not done.is_set():
+                self.root.after(int(REFRESH_SECONDS * 1000), refresh)
+            else:
+                self.root.quit()
+
+        self.root.after(int(REFRESH_SECONDS * 1000), refresh)
+        self.root.mainloop()
+
+    def render(self):
+        rate, eta, failed, in_flight = self.stats()
+        self.progress['value'] = self.current / self.total * 100 if self.total else 100
+        self.label.config(text=f"{self.current} / {self.total} items generated")
+        if self.stop_requested:
+            details = "Stopping after the requests in flight..."
+        else:
+            details = f"{rate:.1f} pairs/s"
+            if eta is not None:
+                details += f", {format_duration(eta)} left"
+            details += f"\n{failed} failed, {in_flight} requests in flight"
+        self.details.config(text=details)
+
+    def close(self):
+        self.root.destroy()
+
+
+class TerminalProgress(Progress):
+    """tqdm progress bar, for runs without a display."""
+
+    def __init__(self, total, metrics=None):
+        super().__init__(total, metrics)
+        self.bar = tqdm(total=total, unit="pair")
+
+    def show_until_done(self, done):
+        while not done.wait(REFRESH_SECONDS):
+            self.drain()
+            self.render()
+        self.drain()
+        self.render()
+
+    def render(self):
+        _, _, failed, in_flight = self.stats()
+        # tqdm computes the rate and ETA itself
+        self.bar.n = self.current
+        self.bar.set_postfix(failed=failed, in_flight=in_flight, refresh=False)
+        self.bar.refresh()
+
+    def close(self):
+        self.bar.close()
+
+
+def open_progress(total, metrics=None, gui=True):
+    """Return a TkProgress, or a TerminalProgress without `gui` or when no display is available."""
+    if gui and tk is not None:
+        try:
+            return TkProgress(total, metrics)
+        except tk.TclError:
+            pass
+    return TerminalProgress(total, metrics)
@@ -0,0 +1,115 @@
+"""
+Prompt Similarity - Pruning pairs of near-identical prompts before generation
+
+Combining two prompts that say the same thing wastes an API call and yields a
+near-copy. This module compares the selected prompts with local TF-IDF vectors and
+finds the pairs whose cosine similarity reaches a threshold, along with prompts that
+are exact duplicates once case, punctuation and spacing are ignored. recombine.py
+can leave those pairs out of the plan (--prune-similar).
+
+Everything is computed locally in NumPy. The similarity matrix is computed in blocks
+of rows, so only a block x N slice of it is ever in memory.
+"""
+
+import re
+from itertools import combinations
+
+import numpy as np
+
+# Rows of the similarity matrix computed at once
+SIMILARITY_BLOCK_ROWS = 1024
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_prompt(text):
+    """Lowercase words separated by single spaces, ignoring punctuation and spacing."""
+    if not isinstance(text, str):
+        return ""
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def tfidf_matrix(texts):
+    """Return L2-normalized TF-IDF vectors of the texts as a dense float32 array.
+
+    Only words that occur in at least two texts get a column, since no other word can
+    make two texts similar; all words still count towards each vector's length.
+    """
+    vocabulary = {}
+    documents = []
+    terms = []
+    for index, text in enumerate(texts):
+        words = normalize_prompt(text).split()
+        documents.extend([index] * len(words))
+        terms.extend(vocabulary.setdefault(word, len(vocabulary)) for word in words)
+    n = len(texts)
+    if not terms:
+        return np.zeros((n, 0), dtype=np.float32)
+
+    # Term counts per (document, term)
+    cells, counts = np.unique(np.array(documents, dtype=np.int64) * len(vocabulary) + np.array(terms), return_counts=True)
+    documents, terms = cells // len(vocabulary), cells % len(vocabulary)
+    document_frequency = np.bincount(terms, minlength=len(vocabulary))
+
+    # Smoothed inverse document frequency, as in scikit-learn
+    idf = np.log((1 + n) / (1 + document_frequency)) + 1
+    weights = counts * idf[terms]
+    lengths = np.sqrt(np.bincount(documents, weights=weights ** 2, minlength=n))
+
+    shared = document_frequency[terms] >= 2
+    columns = np.cumsum(document_frequency >= 2) - 1
+    vectors = np.zeros((n, int((document_frequency >= 2).sum())), dtype=np.float32)
+    vectors[documents[shared], columns[terms[shared]]] = weights[shared] / lengths[documents[shared]]
+    return vectors
+
+
+def similar_pairs(texts, threshold, block_rows=SIMILARITY_BLOCK_ROWS):
+    """Return (i, j, similarity) arrays for all i < j whose TF-IDF cosine similarity >= threshold.
+
+    Texts that are equal after normalize_prompt() always count as similar (1.0), even
+    if they have no words at all.
+    """
+    vectors = tfidf_matrix(texts)
+    n = len(texts)
+    found_i, found_j, found_similarity = [], [], []
+    for start in range(0, n, block_rows):
+        block = vectors[start:start + block_rows] @ vectors.T
+        rows, columns = np.nonzero(block >= threshold - 1e-6)
+        rows = rows + start
+        upper = columns > rows
+        found_i.append(rows[upper])
+        found_j.append(columns[upper])
+        found_similarity.append(np.minimum(block[rows[upper] - start, columns[upper]], 1.0))
+
+    # Exact duplicates after normalization, including texts without words
+    groups = {}
+    for index, text in enumerate(texts):
+        groups.setdefault(normalize_prompt(text), []).append(index)
+    duplicates = [pair for members in groups.values() for pair in combinations(members, 2)]
+    if duplicates:
+        duplicates = np.array(duplicates, dtype=np.int64)
+        found_i.append(duplicates[:, 0])
+        found_j.append(duplicates[:, 1])
+        found_similarity.append(np.ones(len(duplicates)))
+
+    i = np.concatenate(found_i) if found_i else np.empty(0, dtype=np.int64)
+    j = np.concatenate(found_j) if found_j else np.empty(0, dtype=np.int64)
+    similarity = np.concatenate(found_similarity) if found_similarity else np.empty(0)
+    # A pair can be found both ways; keep it once
+    cells, index = np.unique(i * n + j, return_index=True)
+    return cells // n, cells % n, similarity[index]
+
+
+def find_similar_pairs(items, threshold):
+    """Return the set of (row_id1, row_id2) pairs of selected (row_id, prompt) items to prune.
+
+    Both orders of each pair are included, so membership can be tested for a pair in
+    whatever order the plan yields it.
+    """
+    row_ids = [row_id for row_id, _ in items]
+    i, j, _ = similar_pairs([prompt for _, prompt in items], threshold)
+    pruned = set()
+    for first, second in zip(i.tolist(), j.tolist()):
+        pruned.add((row_ids[first], row_ids[second]))
+        pruned.add((row_ids[second], row_ids[first]))
+    return pruned
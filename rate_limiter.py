@@ -0,0 +1,187 @@
+"""
+Rate Limiter - Shared request pacing for recombine.py
+
+Tracks the requests-per-minute and tokens-per-minute budgets of the OpenAI account as
+token buckets and paces every outgoing request so the run stays just under the limits
+instead of bouncing off 429 responses. The limits are learned from the
+x-ratelimit-* response headers, and retry-after headers pause all requests at once.
+"""
+
+import asyncio
+import re
+import threading
+import time
+
+# Fraction of the advertised limits we actually use, to leave room for clock drift
+DEFAULT_HEADROOM = 0.95
+
+# Fallback wait when a 429 response carries no usable headers
+MAX_BACKOFF_SECONDS = 60
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value):
+    """Parse a rate limit duration like '1s', '6m0s' or '20ms' into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_number(headers, name):
+    """Read a numeric header, returning None when it is missing or malformed."""
+    value = headers.get(name) if headers is not None else None
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def estimate_tokens(messages, max_tokens):
+    """Estimate the tokens a request counts against the TPM budget.
+
+    The API charges the prompt plus the full max_tokens allowance up front, so we do
+    the same, using the usual rough figure of four characters per token.
+    """
+    characters = sum(len(message["content"]) for message in messages)
+    return characters // 4 + max_tokens
+
+
+class TokenBucket:
+    """A budget of `limit` units per minute that refills continuously."""
+
+    def __init__(self, limit):
+        self.limit = float(limit)
+        self.level = float(limit)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        rate = self.limit / 60.0
+        self.level = min(self.limit, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        """Take `amount` from the bucket and return how long the caller must wait."""
+        self._refill(now)
+        # A single request larger than the whole budget would otherwise never fit
+        self.level -= min(amount, self.limit)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / (self.limit / 60.0)
+
+    def set_limit(self, limit, now):
+        self._refill(now)
+        self.level = min(self.level, float(limit))
+        self.limit = float(limit)
+
+    def sync(self, remaining, now):
+        """Lower our estimate if the server reports less budget than we think we have."""
+        self._refill(now)
+        self.level = min(self.level, float(remaining))
+
+    def drain(self, now):
+        self._refill(now)
+        self.level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    """Shared scheduler that paces requests against RPM and TPM budgets.
+
+    Either limit may be None, in which case it is unlimited until the first response
+    headers tell us the real value. The limiter is thread-safe, and `acquire()` paces
+    the asyncio engine without blocking its event loop.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, headroom=DEFAULT_HEADROOM):
+        self.headroom = headroom
+        self.requests = TokenBucket(requests_per_minute * headroom) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute * headroom) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens):
+        """Reserve budget for one request and return the delay before sending it."""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.reserve(tokens, now))
+            return delay
+
+    async def acquire(self, tokens):
+        """Wait without blocking the event loop until a request may be sent."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def update_from_headers(self, headers):
+        """Learn limits and remaining budget from x-ratelimit-* response headers."""
+        if headers is None:
+            return
+        limit_requests = _header_number(headers, "x-ratelimit-limit-requests")
+        limit_tokens = _header_number(headers, "x-ratelimit-limit-tokens")
+        remaining_requests = _header_number(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_number(headers, "x-ratelimit-remaining-tokens")
+        with self._lock:
+            now = time.monotonic()
+            if limit_requests:
+                if self.requests is None:
+                    self.requests = TokenBucket(limit_requests * self.headroom)
+                else:
+                    self.requests.set_limit(limit_requests * self.headroom, now)
+            if limit_tokens:
+                if self.tokens is None:
+                    self.tokens = TokenBucket(limit_tokens * self.headroom)
+                else:
+                    self.tokens.set_limit(limit_tokens * self.headroom, now)
+            if remaining_requests is not None and self.requests is not None:
+                self.requests.sync(remaining_requests, now)
+            if remaining_tokens is not None and self.tokens is not None:
+                self.tokens.sync(remaining_tokens, now)
+
+    def record_rate_limit(self, headers, attempt=0):
+        """Pause all requests after a 429 and return how long the pause lasts.
+
+        The pause comes from retry-after(-ms) when present, then from the reset
+        headers, and only falls back to exponential backoff when neither is sent.
+        """
+        self.update_from_headers(headers)
+        wait = None
+        if headers is not None:
+            retry_after_ms = _header_number(headers, "retry-after-ms")
+            if retry_after_ms is not None:
+                wait = retry_after_ms / 1000.0
+            elif headers.get("retry-after") is not None:
+                wait = parse_duration(headers.get("retry-after"))
+            if wait is None:
+                resets = [
+                    parse_duration(headers.get("x-ratelimit-reset-requests")),
+                    parse_duration(headers.get("x-ratelimit-reset-tokens"))
+                ]
+                resets = [reset for reset in resets if reset is not None]
+                wait = max(resets) if resets else None
+        if wait is None:
+            wait = min(MAX_BACKOFF_SECONDS, 2 ** attempt)
+        with self._lock:
+            now = time.monotonic()
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, now + wait)
+            if self.requests is not None:
+                self.requests.drain(now)
+            if self.tokens is not None:
+                self.tokens.drain(now)
+        return wait
@@ -0,0 +1,290 @@
+"""
+Rating Matrix - Sparse, vectorized store of the heat map's ratings
+
+Turns (1st source ID, 2nd source ID, rating) rows into per-cell average ratings with
+NumPy operations instead of a Python loop over rows. Repeated pairs are averaged,
+unrated rows (NaN) are ignored, and the i<j results can optionally be mirrored into
+a symmetric matrix.
+
+load_ratings() streams a rated output file into a SparseRatingMatrix chunk by chunk,
+reading only the source ID and rating columns.
+"""
+
+import csv
+import os
+
+import numpy as np
+
+# Rows per chunk when streaming rated Parquet files
+LOAD_CHUNK_ROWS = 100_000
+
+# Bytes per chunk when streaming rated CSV files
+LOAD_CHUNK_BYTES = 16 << 20
+
+
+class SparseRatingMatrix:
+    """Sparse per-cell rating store for heat maps over thousands of prompts.
+
+    Only cells that were actually rated take memory: the store keeps sorted, unique
+    cell keys with the sum, count and sum of squares of their ratings (a COO layout
+    kept in row-major order, so rows are contiguous as in CSR). Ratings can be added
+    in chunks; marginals, top pairs and dense viewports are all computed from the
+    rated cells with vectorized NumPy operations.
+    """
+
+    # Chunks are merged into the consolidated arrays once this many ratings are pending
+    CONSOLIDATE_EVERY = 1_000_000
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.sums = np.empty(0, dtype=np.float64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.squares = np.empty(0, dtype=np.float64)
+        self.max_x = 0
+        self.max_y = 0
+        self._pending = []
+        self._pending_size = 0
+
+    @staticmethod
+    def _encode(x, y):
+        return (x << 32) | y
+
+    @staticmethod
+    def _decode(keys):
+        return keys >> 32, keys & 0xFFFFFFFF
+
+    @property
+    def shape(self):
+        return self.max_x, self.max_y
+
+    def add(self, x_ids, y_ids, ratings):
+        """Add ratings for 1-based (x, y) source IDs; NaN ratings are ignored."""
+        x = np.asarray(x_ids, dtype=np.int64)
+        y = np.asarray(y_ids, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float64)
+        rated = ~np.isnan(ratings)
+        x, y, ratings = x[rated], y[rated], ratings[rated]
+        if not len(ratings):
+            return
+        self.max_x = max(self.max_x, int(x.max()))
+        self.max_y = max(self.max_y, int(y.max()))
+        self._pending.append((self._encode(x, y), ratings))
+        self._pending_size += len(ratings)
+        if self._pending_size >= self.CONSOLIDATE_EVERY:
+            self._consolidate()
+
+    def _consolidate(self):
+        if not self._pending:
+            return
+        keys = np.concatenate([keys for keys, _ in self._pending])
+        ratings = np.concatenate([ratings for _, ratings in self._pending])
+        self._pending = []
+        self._pending_size = 0
+
+        unique, cells = np.unique(keys, return_inverse=True)
+        self._merge_cells(
+            unique,
+            np.bincount(cells, weights=ratings),
+            np.bincount(cells),
+            np.bincount(cells, weights=ratings ** 2)
+        )
+
+    def mirrored(self):
+        """Return a copy in which every rating is also counted at its mirrored cell."""
+        self._consolidate()
+        x, y = self._decode(self.keys)
+        off_diagonal = x != y
+        mirror = SparseRatingMatrix()
+        mirror._merge_cells(self.keys, self.sums, self.counts, self.squares)
+        mirror._merge_cells(
+            self._encode(y[off_diagonal], x[off_diagonal]),
+            self.sums[off_diagonal],
+            self.counts[off_diagonal],
+            self.squares[off_diagonal]
+        )
+        side = max(self.max_x, self.max_y)
+        mirror.max_x = mirror.max_y = side
+        return mirror
+
+    def _merge_cells(self, keys, sums, counts, squares):
+        """Merge already aggregated cells into the store."""
+        all_keys = np.concatenate([self.keys, keys])
+        unique, cells = np.unique(all_keys, return_inverse=True)
+        size = len(unique)
+        self.sums = np.bincount(cells, weights=np.concatenate([self.sums, sums]), minlength=size)
+        self.counts = np.bincount(cells, weights=np.concatenate([self.counts, counts]), minlength=size).astype(np.int64)
+        self.squares = np.bincount(cells, weights=np.concatenate([self.squares, squares]), minlength=size)
+        self.keys = unique
+
+    def cells(self):
+        """Return (x, y, mean, count) arrays for every rated cell, in row-major order."""
+        self._consolidate()
+        x, y = self._decode(self.keys)
+        return x, y, self.sums / self.counts, self.counts
+
+    def __len__(self):
+        self._consolidate()
+        return len(self.keys)
+
+    def _marginals(self, ids, size):
+        counts = np.bincount(ids, weights=self.counts, minlength=size + 1)[1:]
+        sums = np.bincount(ids, weights=self.sums, minlength=size + 1)[1:]
+        squares = np.bincount(ids, weights=self.squares, minlength=size + 1)[1:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = sums / counts
+            variance = np.maximum(squares / counts - mean ** 2, 0.0)
+        return {
+            "id": np.arange(1, size + 1),
+            "count": counts.astype(np.int64),
+            "mean": mean,
+            "variance": variance
+        }
+
+    def row_marginals(self):
+        """Count, mean and variance of all ratings per 1st source ID (NaN where unrated)."""
+        self._consolidate()
+        x, _ = self._decode(self.keys)
+        return self._marginals(x, self.max_x)
+
+    def column_marginals(self):
+        """Count, mean and variance of all ratings per 2nd source ID (NaN where unrated)."""
+        self._consolidate()
+        _, y = self._decode(self.keys)
+        return self._marginals(y, self.max_y)
+
+    def top_pairs(self, k=10, min_count=1):
+        """Return the k best-rated cells as (x, y, mean, count) arrays, best first."""
+        x, y, mean, counts = self.cells()
+        eligible = np.flatnonzero(counts >= min_count)
+        if len(eligible) > k:
+            eligible = eligible[np.argpartition(-mean[eligible], k - 1)[:k]]
+        best = eligible[np.argsort(-mean[eligible], kind="stable")]
+        return x[best], y[best], mean[best], counts[best]
+
+    def to_dense(self, rows=None, cols=None):
+        """Return mean ratings for a viewport as a dense matrix (NaN where unrated).
+
+        `rows` and `cols` are 1-based inclusive (first, last) ID ranges and default to
+        the full extent. Only the viewport is ever allocated.
+        """
+        first_x, last_x = rows or (1, self.max_x)
+        first_y, last_y = cols or (1, self.max_y)
+        dense = np.full((last_x - first_x + 1, last_y - first_y + 1), np.nan)
+        x, y, mean, _ = self.cells()
+        inside = (x >= first_x) & (x <= last_x) & (y >= first_y) & (y <= last_y)
+        dense[x[inside] - first_x, y[inside] - first_y] = mean[inside]
+        return dense
+
+    def to_blocks(self, block, rows=None, cols=None):
+        """Return the mean rating per `block` x `block` tile of a viewport.
+
+        Every rating counts equally, so a tile's value is the mean of all ratings that
+        fall in it. The last tile in each direction may be partial.
+        """
+        first_x, last_x = rows or (1, self.max_x)
+        first_y, last_y = cols or (1, self.max_y)
+        tiles_x = -(-(last_x - first_x + 1) // block)
+        tiles_y = -(-(last_y - first_y + 1) // block)
+        self._consolidate()
+        x, y = self._decode(self.keys)
+        inside = (x >= first_x) & (x <= last_x) & (y >= first_y) & (y <= last_y)
+        tiles = ((x[inside] - first_x) // block) * tiles_y + (y[inside] - first_y) // block
+        size = tiles_x * tiles_y
+        sums = np.bincount(tiles, weights=self.sums[inside], minlength=size)
+        counts = np.bincount(tiles, weights=self.counts[inside], minlength=size)
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return means.reshape(tiles_x, tiles_y)
+
+
+def is_rating_column(column):
+    """Rating columns are any with "Rating" in their header, one per judge."""
+    return "Rating" in str(column)
+
+
+def _source_id_columns(columns):
+    """Return the columns holding source IDs: the integer pair from Parquet, else "Source IDs"."""
+    if "source_id_1" in columns and "source_id_2" in columns:
+        return ["source_id_1", "source_id_2"]
+    if "Source IDs" in columns:
+        return ["Source IDs"]
+    raise ValueError("No 'Source IDs' column found")
+
+
+def _add_chunk(ratings, chunk, id_columns, rating_columns):
+    """Fold one chunk of rows into the store, averaging each row's rating columns."""
+    if len(id_columns) == 2:
+        x_ids = chunk[id_columns[0]].to_numpy()
+        y_ids = chunk[id_columns[1]].to_numpy()
+    else:
+        # One split over the joined column is several times faster than str.split per row
+        joined = ",".join(chunk[id_columns[0]].astype(str).tolist())
+        source_ids = np.array(joined.split(","), dtype=np.int64).reshape(-1, 2)
+        x_ids, y_ids = source_ids[:, 0], source_ids[:, 1]
+    ratings.add(x_ids, y_ids, chunk[rating_columns].mean(axis=1).to_numpy())
+
+
+def _csv_chunks(path, chunk_bytes):
+    import pyarrow.csv as pa_csv
+
+    with open(path, newline="", encoding="utf-8") as f:
+        columns = next(csv.reader(f), [])
+    id_columns = _source_id_columns(columns)
+    rating_columns = [column for column in columns if is_rating_column(column)]
+    # Prompt text and other columns are skipped by the parser instead of being converted
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=chunk_bytes),
+        # Generated prompts span lines; without this, blocks are cut inside quoted fields
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=id_columns + rating_columns,
+            column_types={"Source IDs": "string"}
+        )
+    )
+    return id_columns, rating_columns, (batch.to_pandas() for batch in reader)
+
+
+def _parquet_chunks(path, chunk_rows):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    columns = parquet_file.schema_arrow.names
+    id_columns = _source_id_columns(columns)
+    rating_columns = [column for column in columns if is_rating_column(column)]
+    batches = parquet_file.iter_batches(batch_size=chunk_rows, columns=id_columns + rating_columns)
+    return id_columns, rating_columns, (batch.to_pandas() for batch in batches)
+
+
+def _excel_chunks(path, chunk_rows):
+    import pandas as pd
+
+    # Workbooks cannot be read in chunks, but unused columns are still skipped
+    columns = pd.read_excel(path, nrows=0).columns
+    id_columns = _source_id_columns(columns)
+    rating_columns = [column for column in columns if is_rating_column(column)]
+    return id_columns, rating_columns, [pd.read_excel(path, usecols=id_columns + rating_columns)]
+
+
+def load_ratings(path, chunk_rows=LOAD_CHUNK_ROWS, chunk_bytes=LOAD_CHUNK_BYTES):
+    """Stream a rated output file (.csv, .parquet or .xlsx) into a SparseRatingMatrix.
+
+    Only the source ID and rating columns are read, and CSV and Parquet files are
+    processed in chunks (`chunk_bytes` of CSV, `chunk_rows` Parquet rows), so memory
+    is bounded by the rated cells rather than the file. CSV and Parquet need pyarrow.
+    Raises ValueError if the columns are missing.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        id_columns, rating_columns, chunks = _csv_chunks(path, chunk_bytes)
+    elif extension == ".parquet":
+        id_columns, rating_columns, chunks = _parquet_chunks(path, chunk_rows)
+    else:
+        id_columns, rating_columns, chunks = _excel_chunks(path, chunk_rows)
+
+    if not rating_columns:
+        raise ValueError("No rating columns found. Please ensure column headers contain 'Rating'")
+
+    ratings = SparseRatingMatrix()
+    for chunk in chunks:
+        _add_chunk(ratings, chunk, id_columns, rating_columns)
+    return ratings
@@ -0,0 +1,144 @@
+"""
+Response Cache - Persistent content-addressed cache of API completions
+
+Completions are stored in a SQLite database keyed by a hash of everything that
+determines the request: model, messages, temperature and max_tokens. Re-running
+recombine.py with the same sheet, goal and context then costs nothing, and identical
+requests made concurrently within one run only reach the API once.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def cache_key(model, messages, temperature, max_tokens):
+    """Hash the parts of a request that determine its completion."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed completion cache with LRU size and age based eviction.
+
+    The cache is safe to share between threads. `get_or_create()` additionally
+    coalesces identical in-flight requests made from the asyncio engine.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def get(self, key):
+        """Return the cached text for `key`, or None on a miss."""
+        with self._lock:
+            row = self._db.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, text):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, text, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, text, len(text.encode("utf-8")), now, now)
+            )
+
+    async def get_or_create(self, key, create):
+        """Return (text, cached) for `key`, awaiting `create()` only on a miss.
+
+        Concurrent calls for a key that is already being generated wait for that
+        request instead of sending their own.
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending), True
+        text = self.get(key)
+        if text is not None:
+            return text, True
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await create()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody was waiting on it
+            future.exception()
+            raise
+        else:
+            self.put(key, text)
+            future.set_result(text)
+            return text, False
+        finally:
+            del self._inflight[key]
+
+    def evict(self):
+        """Drop entries older than max_age_days, then least recently used ones over max_bytes."""
+        with self._lock:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                self._db.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+            if self.max_bytes:
+                self._db.execute(
+                    """DELETE FROM responses WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS running
+                            FROM responses
+                        ) WHERE running > ?
+                    )""",
+                    (self.max_bytes,)
+                )
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+    def close(self):
+        self.evict()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,368 @@
+"""
+Run Metrics - Request-level instrumentation and run reports for recombine.py
+
+Every API request records its latency, the time it waited for the rate limiter (queue
+wait), its retries, the prompt/completion/cached token counts from `response.usage`
+and the class of any error. Every pair records whether it came from the API, the
+response cache or a resumed journal, or failed, and the time spent writing rows to the
+output file is added up. From these the run keeps rolling
+throughput, latency percentiles and an estimated cost. Latencies and queue waits are
+counted in fixed histogram buckets, so memory stays constant however long the run, and
+percentiles are estimated from the buckets.
+
+While a run is going, a snapshot can be written to a file every few seconds, as JSON
+or, for a file ending in .prom, in the Prometheus text format (e.g. for the node
+exporter's textfile collector). At the end, report() summarizes the whole run.
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# USD per million (input, cached input, output) tokens
+MODEL_PRICES = {
+    "gpt-4-turbo-preview": (10.00, 10.00, 30.00),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+
+# The Batch API bills its tokens at this share of the synchronous price
+BATCH_PRICE_FACTOR = 0.5
+
+# Throughput is reported over this many trailing seconds
+ROLLING_WINDOW_SECONDS = 60
+
+# How often the live metrics file is rewritten
+LIVE_INTERVAL_SECONDS = 5.0
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Upper bounds in seconds of the latency and queue wait buckets: 1 ms to about 10 min, each
+# 25% wider than the last, so an estimated percentile is off by at most that much
+TIMING_BUCKETS = tuple(round(0.001 * 1.25 ** step, 6) for step in range(int(math.log(600_000, 1.25)) + 2))
+
+
+def metrics_report_path(output_file):
+    """Return the JSON run report written next to an output file."""
+    return f"{output_file}.report.json"
+
+
+def _usage_field(usage, name, default=0):
+    """Read a field of response.usage, which is an object from the client and a dict in batch results."""
+    if usage is None:
+        return default
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return default if value is None else value
+
+
+class Histogram:
+    """Counts of observed durations in the TIMING_BUCKETS, plus their count, sum and extremes."""
+
+    def __init__(self, bounds=TIMING_BUCKETS):
+        self.bounds = bounds
+        # The last bucket holds everything above the highest bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def copy(self):
+        histogram = Histogram(self.bounds)
+        histogram.counts = list(self.counts)
+        histogram.count, histogram.sum, histogram.min, histogram.max = self.count, self.sum, self.min, self.max
+        return histogram
+
+    def quantile(self, q):
+        """Estimate the q-quantile, interpolating linearly within its bucket."""
+        rank = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = max(self.bounds[bucket - 1] if bucket else 0.0, self.min)
+                upper = min(self.bounds[bucket] if bucket < len(self.bounds) else self.max, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {}
+        summary = {f"p{percentile}": round(self.quantile(percentile / 100), 4) for percentile in PERCENTILES}
+        summary["mean"] = round(self.sum / self.count, 4)
+        summary["max"] = round(self.max, 4)
+        return summary
+
+
+class RunMetrics:
+    """Thread-safe counters and timings for one generation run."""
+
+    def __init__(self, model, prices=None):
+        self.model = model
+        self.prices = prices or MODEL_PRICES.get(model)
+        self._lock = threading.Lock()
+        self._live = None
+        self.reset()
+
+    def reset(self, model=None):
+        """Start a new run, optionally for a different model."""
+        with self._lock:
+            if model is not None and model != self.model:
+                self.model = model
+                self.prices = MODEL_PRICES.get(model)
+            self.started = time.time()
+            self.pairs = {"api": 0, "cache": 0, "resumed": 0, "failed": 0}
+            self.requests = 0
+            self.attempts = 0
+            self.retries = 0
+            self.rate_limited = 0
+            self.in_flight = 0
+            self.errors = {}
+            self.tokens = {"prompt": 0, "completion": 0, "cached": 0}
+            # The part of `tokens` used through the Batch API, which is billed at a discount
+            self.batch_tokens = {"prompt": 0, "completion": 0, "cached": 0}
+            self.write_seconds = 0.0
+            self.latencies = Histogram()
+            self.queue_waits = Histogram()
+            self._completions = deque()
+
+    # Recording
+
+    def request_sent(self):
+        """An HTTP attempt is starting."""
+        with self._lock:
+            self.attempts += 1
+            self.in_flight += 1
+
+    def request_finished(self, error=None):
+        """An HTTP attempt has ended, successfully or with `error`."""
+        with self._lock:
+            self.in_flight -= 1
+            if error is not None:
+                name = type(error).__name__
+                self.errors[name] = self.errors.get(name, 0) + 1
+                if name == "RateLimitError":
+                    self.rate_limited += 1
+
+    def record_request(self, latency, queue_wait, retries, usage=None, batch=False):
+        """A request succeeded after `retries` retries.
+
+        `latency` is the duration of the successful attempt and `queue_wait` the total
+        time spent waiting for the rate limiter; both are None for a Batch API request
+        (`batch`), whose `usage` is the dict from its result file.
+        """
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+            if latency is not None:
+                self.latencies.observe(latency)
+                self.queue_waits.observe(queue_wait)
+            if usage is not None:
+                for buckets in (self.tokens, self.batch_tokens) if batch else (self.tokens,):
+                    buckets["prompt"] += _usage_field(usage, "prompt_tokens")
+                    buckets["completion"] += _usage_field(usage, "completion_tokens")
+                    buckets["cached"] += _usage_field(_usage_field(usage, "prompt_tokens_details", None), "cached_tokens")
+
+    def record_batch_result(self, usage=None, error_type=None):
+        """A Batch API request finished: with `usage` if it succeeded, else with `error_type`."""
+        with self._lock:
+            self.attempts += 1
+            if error_type is not None:
+                self.errors[error_type] = self.errors.get(error_type, 0) + 1
+        if error_type is None:
+            self.record_request(None, None, 0, usage, batch=True)
+
+    def record_write(self, seconds):
+        """`seconds` were spent writing to the output file (a row, or closing the file)."""
+        with self._lock:
+            self.write_seconds += seconds
+
+    def record_pair(self, source):
+        """A pair is done; `source` is "api", "cache", "resumed" or "failed"."""
+        with self._lock:
+            self.pairs[source] += 1
+            if source != "failed":
+                now = time.monotonic()
+                self._completions.append(now)
+                while self._completions and self._completions[0] < now - ROLLING_WINDOW_SECONDS:
+                    self._completions.popleft()
+
+    # Reporting
+
+    def cost(self):
+        """Estimated cost in USD of the tokens used so far, or None for an unknown model."""
+        if not self.prices:
+            return None
+        input_price, cached_price, output_price = self.prices
+
+        def price(tokens):
+            uncached = tokens["prompt"] - tokens["cached"]
+            return uncached * input_price + tokens["cached"] * cached_price + tokens["completion"] * output_price
+
+        synchronous = {kind: self.tokens[kind] - self.batch_tokens[kind] for kind in self.tokens}
+        return round((price(synchronous) + BATCH_PRICE_FACTOR * price(self.batch_tokens)) / 1_000_000, 4)
+
+    def snapshot(self):
+        """Return the current metrics as a JSON-serializable dict."""
+        return self._snapshot()[0]
+
+    def _snapshot(self):
+        """Return the snapshot dict and copies of the latency and queue wait histograms.
+
+        Only the copying is done under the lock; percentiles are computed from the copies.
+        """
+        with self._lock:
+            elapsed = time.time() - self.started
+            now = time.monotonic()
+            recent = sum(1 for completed in self._completions if completed >= now - ROLLING_WINDOW_SECONDS)
+            done = sum(count for source, count in self.pairs.items() if source != "failed")
+            latencies, queue_waits = self.latencies.copy(), self.queue_waits.copy()
+            snapshot = {
+                "model": self.model,
+                "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+                "elapsed_seconds": round(elapsed, 1),
+                "pairs": dict(self.pairs),
+                "requests": {
+                    "succeeded": self.requests,
+                    "attempts": self.attempts,
+                    "retries": self.retries,
+                    "rate_limited": self.rate_limited,
+                    "in_flight": self.in_flight
+                },
+                "errors": dict(self.errors),
+                "tokens": dict(self.tokens),
+                "batch_tokens": dict(self.batch_tokens),
+                "write_seconds": round(self.write_seconds, 3),
+                "prompt_cache_hit_rate": round(self.tokens["cached"] / self.tokens["prompt"], 4) if self.tokens["prompt"] else None,
+                "throughput_pairs_per_minute": {
+                    "rolling": round(recent * 60 / min(max(elapsed, 1e-9), ROLLING_WINDOW_SECONDS), 2),
+                    "overall": round(done * 60 / max(elapsed, 1e-9), 2)
+                },
+                "cost_usd": self.cost()
+            }
+        snapshot["latency_seconds"] = latencies.summary()
+        snapshot["queue_wait_seconds"] = queue_waits.summary()
+        return snapshot, latencies, queue_waits
+
+    def prometheus(self):
+        """Return the current metrics in the Prometheus text exposition format."""
+        snapshot, latencies, queue_waits = self._snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP recombine_{name} {help_text}")
+            lines.append(f"# TYPE recombine_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{label}="{label_value}"' for label, label_value in labels.items())
+                lines.append(f"recombine_{name}{{{label_text}}} {value}" if label_text else f"recombine_{name} {value}")
+
+        metric("pairs_total", "counter", "Pairs done, by where the text came from",
+               [({"source": source}, count) for source, count in snapshot["pairs"].items()])
+        metric("requests_total", "counter", "Successful API requests", [({}, snapshot["requests"]["succeeded"])])
+        metric("request_attempts_total", "counter", "HTTP attempts, including retries", [({}, snapshot["requests"]["attempts"])])
+        metric("request_retries_total", "counter", "Retries of successful requests", [({}, snapshot["requests"]["retries"])])
+        metric("requests_in_flight", "gauge", "API requests currently in flight", [({}, snapshot["requests"]["in_flight"])])
+        metric("errors_total", "counter", "Failed attempts, by exception class",
+               [({"class": name}, count) for name, count in snapshot["errors"].items()])
+        metric("tokens_total", "counter", "Tokens reported in response.usage",
+               [({"kind": kind}, count) for kind, count in snapshot["tokens"].items()])
+        metric("write_seconds_total", "counter", "Time spent writing rows to the output file",
+               [({}, snapshot["write_seconds"])])
+        if snapshot["prompt_cache_hit_rate"] is not None:
+            metric("prompt_cache_hit_ratio", "gauge", "Share of prompt tokens served from the API's prompt cache",
+                   [({}, snapshot["prompt_cache_hit_rate"])])
+        for name, histogram, help_text in (
+            ("request_latency_seconds", latencies, "Latency of successful requests"),
+            ("queue_wait_seconds", queue_waits, "Time requests waited for the rate limiter"),
+        ):
+            lines.append(f"# HELP recombine_{name} {help_text}")
+            lines.append(f"# TYPE recombine_{name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(f'recombine_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"recombine_{name}_sum {round(histogram.sum, 6)}")
+            lines.append(f"recombine_{name}_count {histogram.count}")
+        metric("throughput_pairs_per_minute", "gauge", f"Pairs done per minute over the last {ROLLING_WINDOW_SECONDS} s",
+               [({}, snapshot["throughput_pairs_per_minute"]["rolling"])])
+        if snapshot["cost_usd"] is not None:
+            metric("cost_usd", "gauge", "Estimated cost of the tokens used", [({}, snapshot["cost_usd"])])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the current metrics to `path` (Prometheus text for .prom, otherwise JSON), atomically."""
+        if path.endswith(".prom"):
+            content = self.prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temporary, path)
+
+    def start_live(self, path, interval=LIVE_INTERVAL_SECONDS):
+        """Rewrite `path` every `interval` seconds on a background thread until stop_live()."""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.write(path)
+                except OSError as e:
+                    print(f"Error writing metrics: {str(e)}")
+            self.write(path)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self._live = (stop, thread)
+
+    def stop_live(self):
+        if self._live is not None:
+            stop, thread = self._live
+            stop.set()
+            thread.join()
+            self._live = None
+
+    def report(self):
+        """Return a human-readable end-of-run summary."""
+        snapshot = self.snapshot()
+        pairs = snapshot["pairs"]
+        requests = snapshot["requests"]
+        tokens = snapshot["tokens"]
+        lines = [
+            f"Run report ({snapshot['elapsed_seconds']:.0f} s, model {snapshot['model']})",
+            f"  Pairs: {pairs['api']} generated, {pairs['cache']} from cache, {pairs['resumed']} resumed, {pairs['failed']} failed",
+            f"  Requests: {requests['succeeded']} succeeded in {requests['attempts']} attempts ({requests['retries']} retries, {requests['rate_limited']} rate limited)",
+            f"  Throughput: {snapshot['throughput_pairs_per_minute']['overall']} pairs/min",
+            f"  Writing output: {snapshot['write_seconds']:.2f}s",
+        ]
+        for label, key in (("Latency", "latency_seconds"), ("Queue wait", "queue_wait_seconds")):
+            summary = snapshot[key]
+            if summary:
+                lines.append(
+                    f"  {label}: p50 {summary['p50']:.2f}s, p90 {summary['p90']:.2f}s, "
+                    f"p99 {summary['p99']:.2f}s, max {summary['max']:.2f}s"
+                )
+        cached = f"{tokens['cached']} cached"
+        if snapshot["prompt_cache_hit_rate"] is not None:
+            cached += f", {snapshot['prompt_cache_hit_rate']:.1%}"
+        lines.append(f"  Tokens: {tokens['prompt']} prompt ({cached}), {tokens['completion']} completion")
+        if snapshot["errors"]:
+            lines.append("  Errors: " + ", ".join(f"{name} x{count}" for name, count in snapshot["errors"].items()))
+        if snapshot["cost_usd"] is not None:
+            lines.append(f"  Estimated cost: ${snapshot['cost_usd']:.2f}")
+        return "\n".join(lines)
@@ -0,0 +1,57 @@
+"""
+Tests - batch_mode.submit_batches reusing recorded batches
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from batch_mode import submit_batches
+
+
+class FakeClient:
+    """Just the files and batches calls submit_batches makes."""
+
+    def __init__(self):
+        self.statuses = {}
+        self.files = SimpleNamespace(create=lambda file, purpose: SimpleNamespace(id="file"))
+        self.batches = SimpleNamespace(create=self.create, retrieve=self.retrieve)
+
+    def create(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch-{len(self.statuses)}"
+        self.statuses[batch_id] = "in_progress"
+        return SimpleNamespace(id=batch_id)
+
+    def retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, status=self.statuses[batch_id])
+
+
+def write_request_file(tmp_path):
+    path = os.path.join(tmp_path, "batch-0001.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"custom_id": "pair-0"}\n')
+    return path
+
+
+def test_running_and_completed_batches_are_reused(tmp_path):
+    client = FakeClient()
+    path = write_request_file(tmp_path)
+    state_path = os.path.join(tmp_path, "batches.json")
+    first = submit_batches(client, [path], state_path)
+    assert submit_batches(client, [path], state_path) == first
+    client.statuses[first[0]] = "completed"
+    assert submit_batches(client, [path], state_path) == first
+
+
+def test_failed_batches_are_submitted_again(tmp_path):
+    client = FakeClient()
+    path = write_request_file(tmp_path)
+    state_path = os.path.join(tmp_path, "batches.json")
+    previous = submit_batches(client, [path], state_path)
+    for status in ("failed", "expired", "cancelled"):
+        client.statuses[previous[0]] = status
+        again = submit_batches(client, [path], state_path)
+        assert again != previous
+        previous = again
@@ -0,0 +1,28 @@
+"""
+Tests - clean_prefixes.clean_series on chunks that are not all text
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from clean_prefixes import clean_series
+
+
+def test_all_nan_chunk_is_kept():
+    prompts = pd.Series([np.nan, np.nan], name="Prompt")
+    pd.testing.assert_series_equal(clean_series(prompts), prompts)
+
+
+def test_numeric_chunk_is_kept():
+    prompts = pd.Series([1, 2, 3], name="Prompt")
+    pd.testing.assert_series_equal(clean_series(prompts), prompts)
+
+
+def test_mixed_chunk_cleans_only_strings():
+    prompts = pd.Series(["Insight: keep this", 7, None], name="Prompt")
+    assert clean_series(prompts).tolist() == ["keep this", 7, None]
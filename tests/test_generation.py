@@ -0,0 +1,53 @@
+"""
+Tests - generation.generate_all delivering results in pair order
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import generation
+from pairs import PairPlan, select_all
+
+
+def fake_requests(monkeypatch, delay):
+    """Replace the API call with one that takes delay(prompt_id1, prompt_id2) seconds; returns the completion order."""
+    finished = []
+
+    async def generate_text_async(client, prompt1, prompt2, prompt_id1, prompt_id2, **kwargs):
+        await asyncio.sleep(delay(prompt_id1, prompt_id2))
+        finished.append((prompt_id1, prompt_id2))
+        return {'text': f"{prompt1}+{prompt2}", 'source_ids': f"{prompt_id1},{prompt_id2}"}
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(generation, "generate_text_async", generate_text_async)
+    return finished
+
+
+def test_results_in_pair_order_when_requests_finish_out_of_order(monkeypatch):
+    # Later pairs finish first
+    finished = fake_requests(monkeypatch, lambda id1, id2: 0.001 * ((7 - id1) * 7 + (7 - id2)))
+    plan = PairPlan(select_all([f"p{index}" for index in range(1, 8)]))
+    expected = [f"{id1},{id2}" for _, _, id1, id2 in plan]
+
+    results = asyncio.run(generation.generate_all(plan, concurrency=4))
+    assert [result['source_ids'] for result in results] == expected
+    assert [f"{id1},{id2}" for id1, id2 in finished] != expected
+
+    delivered = []
+    asyncio.run(generation.generate_all(plan, concurrency=4, on_output=lambda pair, result: delivered.append(result['source_ids'])))
+    assert delivered == expected
+
+
+def test_reorder_window_bounds_the_buffer(monkeypatch):
+    # The first pair is slow; the workers must not run more than the window ahead of it
+    finished = fake_requests(monkeypatch, lambda id1, id2: 0.2 if (id1, id2) == (1, 2) else 0.0)
+    monkeypatch.setattr(generation, "REORDER_WINDOW_PER_WORKER", 2)
+    plan = PairPlan(select_all([f"p{index}" for index in range(1, 12)]))
+
+    results = asyncio.run(generation.generate_all(plan, concurrency=2))
+    assert len(results) == len(plan)
+    # With a window of 2 workers x 2 pairs, at most 3 later pairs finish before the first
+    assert finished.index((1, 2)) <= 3
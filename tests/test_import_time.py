@@ -0,0 +1,22 @@
+"""
+Tests - recombine.py subcommands keep their heavy imports lazy
+
+Runs the forbidden-module checks of benchmarks/check_import_time.py. The time budgets
+depend on the machine and are left to that script.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+from check_import_time import CHECKS, import_times
+
+
+@pytest.mark.parametrize("subcommand", list(CHECKS))
+def test_subcommand_does_not_import_heavy_modules(subcommand):
+    _, forbidden = CHECKS[subcommand]
+    modules = import_times(subcommand)
+    assert [module for module in forbidden if module in modules] == []
@@ -0,0 +1,93 @@
+"""
+Tests - merge_shards validating and merging sharded outputs
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from merge_shards import load_shards, merge_shards, shard_metadata_path, validate_shards, write_shard_metadata
+from output_sinks import open_sink
+from pairs import PairPlan, select_all
+
+SHARDS = 3
+
+
+@pytest.fixture
+def shard_files(tmp_path):
+    """Write the outputs and metadata of a complete 3-shard run over 6 prompts."""
+    plan = PairPlan(select_all([f"prompt {index}" for index in range(1, 7)]))
+    paths = []
+    for shard in range(1, SHARDS + 1):
+        shard_plan = plan.shard(shard, SHARDS)
+        path = os.path.join(tmp_path, f"shard-{shard}.csv")
+        rows = [
+            {"#": rank + 1, "Source IDs": f"{id1},{id2}", "Prompt": f"text {rank + 1}"}
+            for rank, (_, _, id1, id2) in shard_plan.ranked()
+        ]
+        pd.DataFrame(rows).to_csv(path, index=False)
+        write_shard_metadata(path, shard_plan, shard, SHARDS, run_key="key", model="model", input_file="in.xlsx", rows=len(rows))
+        paths.append(path)
+    return paths
+
+
+def edit_metadata(path, **fields):
+    with open(shard_metadata_path(path), encoding="utf-8") as f:
+        metadata = json.load(f)
+    metadata.update(fields)
+    with open(shard_metadata_path(path), "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+
+
+def test_complete_run_merges_in_pair_order(shard_files, tmp_path):
+    shards = load_shards(list(reversed(shard_files)))
+    assert validate_shards(shards) == []
+    output = os.path.join(tmp_path, "merged.csv")
+    with open_sink(output) as sink:
+        assert merge_shards(shards, sink) == 15
+    assert pd.read_csv(output)["#"].tolist() == list(range(1, 16))
+
+
+def test_missing_shard_is_rejected(shard_files):
+    problems = validate_shards(load_shards([shard_files[0], shard_files[2]]))
+    assert problems == ["Missing shards: [2]"]
+
+
+def test_duplicated_shard_is_rejected(shard_files):
+    problems = validate_shards(load_shards(shard_files + [shard_files[1]]))
+    assert "Duplicated shards: [2]" in problems
+
+
+def test_gap_between_shard_ranges_is_rejected(shard_files):
+    edit_metadata(shard_files[1], stop=9)
+    problems = validate_shards(load_shards(shard_files))
+    assert any("Shard 3 starts at pair 11, expected 10" in problem for problem in problems)
+
+
+def test_overlapping_shard_ranges_are_rejected(shard_files):
+    edit_metadata(shard_files[1], stop=12)
+    problems = validate_shards(load_shards(shard_files))
+    assert any("Shard 3 starts at pair 11, expected 13" in problem for problem in problems)
+
+
+def test_row_from_another_shard_is_rejected(shard_files):
+    extra = pd.read_csv(shard_files[2]).head(1)
+    rows = pd.concat([pd.read_csv(shard_files[1]), extra])
+    rows.to_csv(shard_files[1], index=False)
+    problems = validate_shards(load_shards(shard_files))
+    assert problems == ["Shard 2 contains pair #11, which is not one of its pairs"]
+
+
+def test_missing_and_repeated_rows_are_rejected(shard_files):
+    rows = pd.read_csv(shard_files[1])
+    pd.concat([rows.iloc[:2], rows.iloc[1:2], rows.iloc[3:]]).to_csv(shard_files[1], index=False)
+    problems = validate_shards(load_shards(shard_files))
+    assert problems == [
+        "Shard 2 contains 1 duplicated or out-of-order pairs",
+        "Shard 2 is missing 1 pairs beyond the 0 filtered out, e.g. #8",
+    ]
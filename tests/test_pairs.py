@@ -0,0 +1,61 @@
+"""
+Tests - pairs.iter_index_pairs, shard_range and PairPlan.shard
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pairs import PAIR_ORDERS, PairPlan, iter_index_pairs, pair_count, shard_range
+
+ORDER_KEYS = {
+    "row": lambda pair: pair,
+    "column": lambda pair: (pair[1], pair[0]),
+    "diagonal": lambda pair: (pair[1] - pair[0], pair[0]),
+}
+
+
+@pytest.mark.parametrize("order", PAIR_ORDERS)
+@pytest.mark.parametrize("n", [0, 1, 2, 7])
+def test_every_pair_once_in_order(order, n):
+    expected = sorted(((i, j) for i in range(n) for j in range(i + 1, n)), key=ORDER_KEYS[order])
+    assert list(iter_index_pairs(n, order)) == expected
+    assert pair_count(n) == len(expected)
+
+
+@pytest.mark.parametrize("order", PAIR_ORDERS)
+def test_rank_range_matches_slice_of_full_order(order):
+    n = 9
+    full = list(iter_index_pairs(n, order))
+    for start in range(len(full) + 1):
+        for stop in range(start, len(full) + 1):
+            assert list(iter_index_pairs(n, order, start, stop)) == full[start:stop]
+
+
+@pytest.mark.parametrize("total, shards", [(0, 3), (1, 4), (10, 3), (36, 4), (36, 36), (499500, 7)])
+def test_shards_tile_the_ranks(total, shards):
+    ranges = [shard_range(total, shard, shards) for shard in range(1, shards + 1)]
+    assert ranges[0][0] == 0 and ranges[-1][1] == total
+    for (_, stop), (start, _) in zip(ranges, ranges[1:]):
+        assert stop == start
+    sizes = [stop - start for start, stop in ranges]
+    assert max(sizes) - min(sizes) <= 1
+
+
+@pytest.mark.parametrize("shard", [0, 4])
+def test_shard_out_of_range(shard):
+    with pytest.raises(ValueError):
+        shard_range(10, shard, 3)
+
+
+@pytest.mark.parametrize("order", PAIR_ORDERS)
+def test_plan_shards_cover_every_pair_once(order):
+    plan = PairPlan([(row_id, f"prompt {row_id}") for row_id in range(1, 10)], order=order)
+    ranked = []
+    for shard in range(1, 5):
+        ranked.extend(plan.shard(shard, 4).ranked())
+    assert ranked == list(plan.ranked())
+    assert [rank for rank, _ in ranked] == list(range(plan.total))
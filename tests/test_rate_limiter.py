@@ -0,0 +1,70 @@
+"""
+Tests - rate_limiter.TokenBucket and RateLimiter header handling
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rate_limiter import RateLimiter, TokenBucket
+
+
+def test_reserve_within_budget_needs_no_wait():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    assert bucket.reserve(30, now) == 0.0
+    assert bucket.reserve(30, now) == 0.0
+
+
+def test_reserve_beyond_budget_waits_for_refill():
+    # 60 per minute refills one unit per second
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.reserve(60, now)
+    assert bucket.reserve(2, now) == pytest.approx(2.0)
+    assert bucket.reserve(1, now) == pytest.approx(3.0)
+
+
+def test_bucket_refills_over_time():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.reserve(60, now)
+    assert bucket.reserve(10, now + 10) == pytest.approx(0.0)
+
+
+def test_request_larger_than_the_budget_still_fits():
+    bucket = TokenBucket(60)
+    assert bucket.reserve(1000, bucket.updated) == 0.0
+
+
+def test_headers_set_limits_and_remaining_budget():
+    limiter = RateLimiter(headroom=1.0)
+    assert limiter.reserve(100) == 0.0
+    limiter.update_from_headers({
+        "x-ratelimit-limit-requests": "60",
+        "x-ratelimit-limit-tokens": "6000",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-remaining-tokens": "6000",
+    })
+    assert limiter.requests.limit == 60
+    assert limiter.tokens.limit == 6000
+    # No requests left: the next one waits about a second for the bucket to refill
+    assert limiter.reserve(100) == pytest.approx(1.0, abs=0.05)
+
+
+def test_headers_apply_headroom_and_ignore_malformed_values():
+    limiter = RateLimiter(requests_per_minute=100, headroom=0.5)
+    limiter.update_from_headers({"x-ratelimit-limit-requests": "200", "x-ratelimit-limit-tokens": "lots"})
+    assert limiter.requests.limit == 100
+    assert limiter.tokens is None
+    limiter.update_from_headers(None)
+    assert limiter.requests.limit == 100
+
+
+def test_remaining_headers_only_lower_the_estimate():
+    limiter = RateLimiter(requests_per_minute=60, headroom=1.0)
+    limiter.update_from_headers({"x-ratelimit-remaining-requests": "1000"})
+    assert limiter.requests.level <= 60
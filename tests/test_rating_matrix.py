@@ -0,0 +1,29 @@
+"""
+Tests - rating_matrix.load_ratings on rated CSV files
+"""
+
+import csv
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rating_matrix import load_ratings
+
+
+def test_multiline_prompts_across_csv_blocks(tmp_path):
+    path = os.path.join(tmp_path, "rated.csv")
+    rows = [(index, f"1,{index + 1}", f"Line one of {index}\nline two,\n\"quoted\" three", index % 5 + 1) for index in range(1, 201)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["#", "Source IDs", "Prompt", "Rating"])
+        writer.writerows(rows)
+
+    # Blocks far smaller than the file, so quoted newlines fall on block boundaries
+    ratings = load_ratings(path, chunk_bytes=256)
+
+    assert len(ratings) == len(rows)
+    matrix = ratings.to_dense()
+    assert np.allclose(matrix[0, 1:201], [rating for *_, rating in rows])